@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+from st_aggrid import AgGrid
 from st_aggrid.shared import GridUpdateMode
-from datetime import datetime
+from receivables import aging, batch, chart_data, charts, drilldown, engine, export, grid_data, ingest, mappings, pipeline, profiling, report, snapshots
+from receivables.report import format_vnd
 # import numpy as np
 
 # --- Cấu hình trang ---
@@ -13,146 +14,230 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# --- Hàm hỗ trợ ---
-def calculate_age_category_detailed(days_overdue):
-    """Phân loại tuổi nợ chi tiết"""
-    if days_overdue <= 0:
-        return 'Trong hạn'
-    elif 1 <= days_overdue <= 30:
-        return '1-30'
-    elif 31 <= days_overdue <= 60:
-        return '31-60'
-    elif 61 <= days_overdue <= 90:
-        return '61-90'
-    else: # days_overdue > 90
-        return 'Trên 90'
-
-def format_vnd(amount):
-    """Định dạng số tiền sang kiểu VND"""
-    if pd.isna(amount) or amount == 0:
-        return "0"
-    return f"{int(amount):,.0f}" # Không có phần thập phân
-
-def generate_tooltip_html(service_data_df, amount_col_name='amount'):
-    """
-    Generates an HTML string for tooltips from service breakdown data.
-    service_data_df is expected to have 'service_type' and amount_col_name columns.
-    """
-    if not isinstance(service_data_df, pd.DataFrame) or service_data_df.empty:
-        return None
-    lines = []
-    for _, row in service_data_df.iterrows():
-        service = row['service_type']
-        amount = row[amount_col_name]
-        if pd.notna(amount) and amount > 0: # Only show services with positive amounts
-            lines.append(f"{service}: {format_vnd(amount)}")
-    return "\n".join(lines) if lines else None
+# Dữ liệu biểu đồ đã được tổng hợp ở server, số dòng chỉ phụ thuộc số điểm trên biểu đồ;
+# vẫn giữ giới hạn (nới so với mặc định 5.000) để biểu đồ không nhúng cả dữ liệu lớn vào trang
+CHART_MAX_ROWS = 20_000
+alt.data_transformers.enable('default', max_rows=CHART_MAX_ROWS)
+
+STACKED_BAR_TOP_N_OPTIONS = [10, 20, 50, 100]
+STACKED_BAR_ALL_OPTION = "Tất cả"
+STACKED_BAR_ALL_MAX_CUSTOMERS = 200 # Trên ngưỡng này không cho chọn "Tất cả" (mỗi khách hàng × loại hình là một cột)
+TREND_FREQUENCIES = {"Tháng": "ME", "Quý": "QE", "Tuần": "W-SUN"}
+TREND_PERIOD_OPTIONS = [6, 12, 24, 36]
 
 # --- Sidebar ---
 st.sidebar.header("📁 Tải Lên Dữ Liệu")
-uploaded_file = st.sidebar.file_uploader("Chọn file Excel (.xls, .xlsx)", type=["xls", "xlsx"])
+data_source = st.sidebar.radio("Nguồn dữ liệu:", ["Tải file Excel", "Snapshot đã lưu"], horizontal=True)
+
+uploaded_files = []
+snapshot_selected = None
+if data_source == "Tải file Excel":
+    uploaded_files = st.sidebar.file_uploader(
+        "Chọn file Excel (.xls, .xlsx)", type=["xls", "xlsx"], accept_multiple_files=True
+    ) or []
+else:
+    saved_snapshots = snapshots.list_snapshots()
+    if saved_snapshots:
+        snapshot_selected = st.sidebar.selectbox(
+            "Chọn snapshot:", saved_snapshots, format_func=lambda info: info.label
+        )
+    else:
+        st.sidebar.info(f"Chưa có snapshot nào trong thư mục '{snapshots.SNAPSHOT_DIR}'.")
 
 sheet_name_selected = None
-xls = None # Initialize xls
-if uploaded_file:
-    try:
-        xls = pd.ExcelFile(uploaded_file)
-        sheet_names = xls.sheet_names
-        if not sheet_names:
-            st.sidebar.warning("File Excel không có sheet nào.")
-            uploaded_file = None
-        else:
-            sheet_name_selected = st.sidebar.selectbox("Chọn sheet chứa dữ liệu công nợ:", sheet_names)
-    except Exception as e:
-        st.sidebar.error(f"Lỗi khi đọc file Excel: {e}")
-        uploaded_file = None
+uploaded_file = None
+file_bytes = None
+file_digest = None
+streaming_read = False
+selected_parts = [] # [batch.BatchPart] cho từng (file, sheet) được chọn
+if uploaded_files:
+    workbooks = [] # [(uploaded_file, file_bytes, file_digest, sheet_names)]
+    for workbook_file in uploaded_files:
+        try:
+            workbook_bytes = workbook_file.getvalue()
+            workbook_digest = ingest.content_digest(workbook_bytes)
+            sheet_names = ingest.list_sheets(workbook_bytes, workbook_digest)
+            if not sheet_names:
+                st.sidebar.warning(f"File Excel '{workbook_file.name}' không có sheet nào.")
+            else:
+                workbooks.append((workbook_file, workbook_bytes, workbook_digest, sheet_names))
+        except Exception as e:
+            st.sidebar.error(f"Lỗi khi đọc file Excel '{workbook_file.name}': {e}")
+
+    if workbooks:
+        multiple_files = len(workbooks) > 1
+        part_options = [(i, sheet) for i, (_, _, _, sheet_names) in enumerate(workbooks) for sheet in sheet_names]
+        selected_options = st.sidebar.multiselect(
+            "Chọn sheet chứa dữ liệu công nợ:", part_options,
+            default=[(i, sheet_names[0]) for i, (_, _, _, sheet_names) in enumerate(workbooks)],
+            format_func=lambda option: f"{workbooks[option[0]][0].name} / {option[1]}" if multiple_files else option[1],
+            help="Có thể chọn nhiều sheet/nhiều file; dữ liệu sẽ được gộp lại với cột nguồn (chi nhánh)."
+        )
+        selected_parts = [
+            batch.BatchPart(workbooks[i][0].name, workbooks[i][1], workbooks[i][2], sheet)
+            for i, sheet in selected_options
+        ]
+        if any(ingest.is_xlsx(part.data) for part in selected_parts):
+            streaming_read = st.sidebar.toggle(
+                "Đọc theo luồng (tiết kiệm bộ nhớ)",
+                value=any(len(part.data) > ingest.STREAMING_THRESHOLD_BYTES for part in selected_parts),
+                help="Đọc từng dòng bằng openpyxl, chỉ giữ các cột cần thiết. Phù hợp với file rất lớn."
+            )
+        if len(selected_parts) == 1:
+            uploaded_file = workbooks[selected_options[0][0]][0]
+            file_bytes = selected_parts[0].data
+            file_digest = selected_parts[0].digest
+            sheet_name_selected = selected_parts[0].sheet_name
+
+# --- Ngày chốt tuổi nợ và chế độ xu hướng ---
+as_of_input = st.sidebar.date_input(
+    "Ngày chốt tuổi nợ:", value=aging.as_of_timestamp().date(), format="DD/MM/YYYY",
+    help="Tuổi nợ được tính đến ngày này (mặc định là hôm nay)."
+)
+trend_mode = st.sidebar.toggle(
+    "📉 Xu hướng tuổi nợ theo kỳ",
+    help="Phân bổ tuổi nợ tại cuối mỗi kỳ trước ngày chốt, tính một lần cho mọi kỳ."
+)
+if trend_mode:
+    trend_frequency = st.sidebar.selectbox("Kỳ:", list(TREND_FREQUENCIES))
+    trend_periods = st.sidebar.selectbox("Số kỳ:", TREND_PERIOD_OPTIONS, index=1)
+
+# --- Chế độ chẩn đoán: đo từng bước xử lý của lần chạy này ---
+profiling_enabled = st.sidebar.toggle(
+    "🩺 Chẩn đoán hiệu năng", value=profiling.enabled_from_env(),
+    help="Đo thời gian, số dòng và mức thay đổi bộ nhớ của từng bước; kết quả hiển thị ở cuối trang."
+)
+profiler = profiling.StageProfiler(enabled=profiling_enabled)
 
 # --- Tiêu đề chính ---
 st.title("📊 BẢNG DASHBOARD QUẢN LÝ CÔNG NỢ ETC")
 st.markdown("---")
 
-if uploaded_file and sheet_name_selected:
+if selected_parts or snapshot_selected:
     try:
-        df_raw = pd.read_excel(uploaded_file, sheet_name=sheet_name_selected)
-        st.sidebar.success(f"Đã tải và đọc thành công sheet: '{sheet_name_selected}'")
-
-        # --- Xử lý dữ liệu với Pandas ---
-        required_columns = {
-            "customer": "KhachHang",      # Tên khách hàng
-            "due_date": "NgayDaoHan",     # Ngày đến hạn (phải là định dạng ngày)
-            "amount": "SoTienPhaiThu",  # Số tiền còn phải thu
-            "service_type": "LoaiHinhDichVu" # Loại hình dịch vụ (R,E,W,P,F)
-        }
-
-        missing_cols = []
-        actual_columns = {}
-        for key, default_name in required_columns.items():
-            if default_name in df_raw.columns:
-                actual_columns[key] = default_name
-            else:
-                found_alt = False
-                common_alternatives = {
-                    "KhachHang": ["khach hang", "ten khach hang", "customer name", "customer","CTY"],
-                    "NgayDaoHan": ["ngay dao han", "due date","HẠN TT"],
-                    "SoTienPhaiThu": ["so tien phai thu", "amount due", "outstanding amount", "balance","DƯ NỢ"],
-                    "LoaiHinhDichVu": ["loai hinh dich vu", "service type", "product type","Loại hình"]
-                }
-                if default_name in common_alternatives:
-                    for alt_name in common_alternatives[default_name]:
-                        # Case-insensitive check for alternative column names
-                        matching_cols = [col for col in df_raw.columns if col.lower() == alt_name.lower()]
-                        if matching_cols:
-                            actual_columns[key] = matching_cols[0] # Use the actual casing from file
-                            st.sidebar.info(f"Sử dụng cột '{matching_cols[0]}' cho '{default_name}'.")
-                            found_alt = True
-                            break
-                if not found_alt and key in ["customer", "due_date", "amount"]:
-                    missing_cols.append(default_name)
-
-        if missing_cols:
-            st.error(f"File Excel thiếu các cột bắt buộc sau: {', '.join(missing_cols)}. Vui lòng kiểm tra lại file.")
-            st.stop()
-        
-        df = df_raw.rename(columns={v: k for k, v in actual_columns.items()})
-
-        if 'due_date' not in df.columns:
-            st.error("Không tìm thấy cột ngày đáo hạn ('NgayDaoHan' hoặc tương đương).")
-            st.stop()
-        try:
-            df['due_date'] = pd.to_datetime(df['due_date'], errors='coerce')
-        except Exception as e:
-            st.error(f"Lỗi chuyển đổi cột ngày đáo hạn: {e}. Đảm bảo cột có định dạng ngày tháng hợp lệ.")
-            st.stop()
-
-        if 'amount' not in df.columns:
-            st.error("Không tìm thấy cột số tiền phải thu ('SoTienPhaiThu' hoặc tương đương).")
-            st.stop()
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0)
-
-        if 'service_type' not in df.columns:
-            st.warning("Không tìm thấy cột 'LoaiHinhDichVu'. Biểu đồ stacked chart và tooltip chi tiết sẽ không có phân loại dịch vụ.")
-            df['service_type'] = 'Không xác định'
+        batch_result = None
+        if snapshot_selected is not None:
+            # Snapshot đã chuẩn hóa sẵn, không cần đọc Excel; dùng lại mã băm file gốc làm khóa cache
+            with profiler.stage('read', note='snapshot') as timing:
+                sheet = snapshots.load_snapshot(snapshot_selected)
+                timing.rows = len(sheet.frame)
+            file_digest = snapshot_selected.source_hash
+            sheet_name_selected = snapshot_selected.sheet_name
+            st.sidebar.success(f"Đã mở snapshot: '{snapshot_selected.source_name}' / '{sheet_name_selected}'")
+        elif len(selected_parts) > 1:
+            with st.spinner(f"Đang đọc song song {len(selected_parts)} sheet..."), \
+                    profiler.stage('read', note=f'{len(selected_parts)} sheet song song') as timing:
+                batch_result = batch.load_batch(selected_parts, streaming=streaming_read)
+                timing.rows = len(batch_result.sheet.frame)
+            for source_label, error_message in batch_result.failures.items():
+                st.sidebar.error(f"Không đọc được '{source_label}': {error_message}")
+            if not batch_result.part_rows:
+                st.error("Không đọc được sheet nào trong các file đã chọn.")
+                st.stop()
+            sheet = batch_result.sheet
+            file_digest = batch_result.digest
+            sheet_name_selected = ", ".join(batch_result.part_rows)
+            st.sidebar.success(f"Đã gộp {len(batch_result.part_rows)} nguồn dữ liệu:")
+            st.sidebar.caption("\n".join(f"- {label}: {rows:,} dòng" for label, rows in batch_result.part_rows.items()))
         else:
-            df['service_type'] = df['service_type'].astype(str).fillna('Không xác định')
+            # File cùng mẫu với một cấu hình cột đã lưu: đọc thẳng các cột cần thiết, bỏ qua bước nhận diện
+            try:
+                _, sheet, _ = engine.load_ledger(
+                    file_bytes, sheet_name_selected, streaming=streaming_read, digest=file_digest, profiler=profiler
+                )
+            except ingest.MissingColumnsError as e:
+                st.error(f"File Excel thiếu các cột bắt buộc sau: {', '.join(e.missing)}. Vui lòng kiểm tra lại file.")
+                st.error(f"Các cột tìm thấy trong sheet '{sheet_name_selected}': {', '.join(e.available)}")
+
+                # Cho phép chọn cột thủ công và lưu thành cấu hình cho các lần tải sau của mẫu file này
+                header = ingest.read_header(file_bytes, sheet_name_selected, file_digest)
+                detected_columns, _, _ = ingest.resolve_columns(header)
+                header_options = [""] + [col for col in header if col]
+                with st.form("column_mapping_form"):
+                    st.markdown("**Chọn cột tương ứng (\\* là bắt buộc) rồi lưu cấu hình cột cho mẫu file này:**")
+                    chosen_columns = {}
+                    for form_col, (key, default_name) in zip(st.columns(len(ingest.REQUIRED_COLUMNS)), ingest.REQUIRED_COLUMNS.items()):
+                        detected = detected_columns.get(key, "")
+                        chosen_columns[key] = form_col.selectbox(
+                            f"{default_name}{' *' if key in ingest.MANDATORY_KEYS else ''}", header_options,
+                            index=header_options.index(detected) if detected in header_options else 0,
+                        )
+                    mapping_submitted = st.form_submit_button("💾 Lưu cấu hình cột và đọc lại")
+                if mapping_submitted:
+                    unselected = [ingest.REQUIRED_COLUMNS[key] for key in ingest.MANDATORY_KEYS if not chosen_columns[key]]
+                    if unselected:
+                        st.error(f"Chưa chọn cột cho: {', '.join(unselected)}")
+                    else:
+                        mappings.save_mapping(
+                            header, {key: col for key, col in chosen_columns.items() if col}, name=uploaded_file.name
+                        )
+                        st.rerun()
+                st.stop()
+            st.sidebar.success(f"Đã tải và đọc thành công sheet: '{sheet_name_selected}'")
+            if sheet.mapping is not None:
+                if sheet.mapping_name is not None:
+                    st.sidebar.caption(f"Dùng cấu hình cột đã lưu '{sheet.mapping_name}', bỏ qua bước nhận diện cột.")
+                else:
+                    st.sidebar.warning(f"Không đọc được file theo cấu hình cột đã lưu '{sheet.mapping.name}', đã tự nhận diện cột.")
+                if st.sidebar.button("🗑️ Bỏ cấu hình cột", help="Xóa cấu hình cột của mẫu file này; lần đọc sau sẽ tự nhận diện cột."):
+                    mappings.delete_mapping(sheet.mapping)
+                    st.rerun()
+            elif st.sidebar.button(
+                "📌 Lưu cấu hình cột",
+                help="Các lần tải sau của file cùng mẫu sẽ đọc thẳng các cột này với kiểu dữ liệu đã biết."
+            ):
+                try:
+                    saved_mapping = mappings.save_mapping(
+                        ingest.read_header(file_bytes, sheet_name_selected, file_digest),
+                        sheet.columns, mappings.read_dtypes(sheet.source_dtypes), name=uploaded_file.name,
+                    )
+                    st.sidebar.success(f"Đã lưu cấu hình cột: {saved_mapping.label}")
+                except ValueError as e:
+                    st.sidebar.error(f"Không lưu được cấu hình cột: {e}")
+            if st.sidebar.button("💾 Lưu snapshot", help="Lưu dữ liệu đã chuẩn hóa để mở lại sau mà không cần file Excel."):
+                saved = snapshots.save_snapshot(sheet, file_digest, sheet_name_selected, uploaded_file.name)
+                st.sidebar.success(f"Đã lưu snapshot: {saved.label}")
+        if sheet.streamed:
+            st.sidebar.caption(
+                f"Đọc theo luồng {sheet.rows_read:,} dòng, giữ lại {len(sheet.frame):,} dòng hợp lệ "
+                f"({sheet.nbytes / 1024 ** 2:,.1f} MB). Bộ nhớ tăng tối đa khi đọc: {sheet.peak_bytes / 1024 ** 2:,.1f} MB."
+            )
+
+        for actual_name, default_name in sheet.column_notes:
+            st.sidebar.info(f"Sử dụng cột '{actual_name}' cho '{default_name}'.")
+        if not sheet.has_service_type:
+            st.warning("Không tìm thấy cột 'LoaiHinhDichVu'. Biểu đồ stacked chart và tooltip chi tiết sẽ không có phân loại dịch vụ.")
 
-        df.dropna(subset=['due_date', 'customer'], inplace=True)
-        df = df[df['amount'] > 0].copy()
+        # Frame trong cache dùng chung giữa các session nên chỉ thêm cột qua assign
+        df = sheet.frame
+
+        if batch_result is not None and len(batch_result.part_rows) > 1:
+            source_options = list(batch_result.part_rows)
+            selected_sources = st.sidebar.multiselect("Lọc theo nguồn (chi nhánh):", source_options, default=source_options)
+            if set(selected_sources) != set(source_options):
+                with profiler.stage('filtering', note='lọc nguồn') as timing:
+                    df = df[df[batch.SOURCE_COLUMN].isin(selected_sources)]
+                    timing.rows = len(df)
+                file_digest = ingest.content_digest(f"{file_digest}|{sorted(selected_sources)}".encode('utf-8'))
 
         if df.empty:
             st.warning("Không có dữ liệu công nợ hợp lệ sau khi xử lý. Vui lòng kiểm tra nội dung file.")
             st.stop()
 
-        current_date = pd.to_datetime(datetime.now().date())
-        df['days_overdue'] = (current_date - df['due_date']).dt.days
-        df['age_category'] = df['days_overdue'].apply(calculate_age_category_detailed)
+        # Các bảng dẫn xuất được ghi nhớ theo đầu vào thực tế: đổi ngày chốt chỉ tính lại từ tuổi nợ
+        # trở đi, đổi tùy chọn hiển thị (top N, trang grid...) không tính lại pivot/tooltip/biểu đồ
+        as_of_date = aging.as_of_timestamp(as_of_input)
+        artifacts = engine.report_artifacts(
+            df, engine.ledger_key(file_digest, sheet_name_selected, sheet), as_of_date,
+            graph=pipeline.DASHBOARD_GRAPH, profiler=profiler,
+        )
 
         # --- Các chỉ tiêu chính về công nợ (st.metric) ---
         st.subheader("📈 CÁC CHỈ TIÊU CHÍNH VỀ CÔNG NỢ")
-        total_receivable = df['amount'].sum()
-        overdue_df = df[df['days_overdue'] > 0]
-        total_overdue_receivable = overdue_df['amount'].sum()
-        overdue_30_days_plus_df = df[df['days_overdue'] > 30]
-        total_overdue_30_days_plus = overdue_30_days_plus_df['amount'].sum()
+        kpis = artifacts['kpis']
+        total_receivable = kpis['total_receivable']
+        total_overdue_receivable = kpis['total_overdue']
+        total_overdue_30_days_plus = kpis['overdue_30_plus']
 
         col1, col2, col3 = st.columns(3)
         col1.metric(label="Tổng Số Dư Công Nợ", value=f"{format_vnd(total_receivable)} VNĐ")
@@ -163,225 +248,171 @@ if uploaded_file and sheet_name_selected:
         st.markdown("---")
 
         # --- Biểu đồ (Altair Chart) ---
+        # Mọi biểu đồ dùng chung một bước tổng hợp phía server, không gửi dòng hóa đơn thô cho Vega
+        chart_frames = artifacts['chart_frames']
+        bar_customer = None # Khách hàng được bấm chọn trên stacked bar
+        grid_customer = None # Khách hàng được chọn trên grid
         layout_cols = st.columns([6, 4]) 
 
         with layout_cols[0]:
             st.subheader("📊 Công Nợ Theo Khách Hàng & Loại Hình Dịch Vụ")
             if not df.empty and 'service_type' in df.columns and 'customer' in df.columns:
-                chart_stacked_bar = alt.Chart(df).mark_bar().encode(
-                    x=alt.X('customer:N', sort='-y', title='Khách Hàng'),
-                    y=alt.Y('sum(amount):Q', title='Tổng Dư Nợ (VNĐ)', axis=alt.Axis(format='~s')),
-                    color=alt.Color('service_type:N', title='Loại Hình Dịch Vụ'),
-                    tooltip=[
-                        alt.Tooltip('customer:N', title='Khách Hàng'),
-                        alt.Tooltip('service_type:N', title='Loại Dịch Vụ'),
-                        alt.Tooltip('sum(amount):Q', title='Dư Nợ', format=',.0f')
-                    ]
-                ).properties(
-                    height=450,
-                    title='Tổng công nợ của từng khách hàng theo loại hình dịch vụ'
+                top_n_options = list(STACKED_BAR_TOP_N_OPTIONS)
+                if len(chart_frames.customer_totals) <= STACKED_BAR_ALL_MAX_CUSTOMERS:
+                    top_n_options.append(STACKED_BAR_ALL_OPTION)
+                top_n_option = st.sidebar.selectbox(
+                    "Số khách hàng trên biểu đồ stacked bar:", top_n_options, index=1,
+                    help=f"Các khách hàng còn lại được gộp vào '{chart_data.OTHERS_LABEL}'. "
+                         f"Chỉ chọn được '{STACKED_BAR_ALL_OPTION}' khi có tối đa {STACKED_BAR_ALL_MAX_CUSTOMERS} khách hàng."
                 )
-                st.altair_chart(chart_stacked_bar, use_container_width=True)
+                artifacts.bind(top_n=None if top_n_option == STACKED_BAR_ALL_OPTION else top_n_option)
+                stacked_bar_data, customer_order = artifacts['stacked_bar']
+                with profiler.stage('chart: stacked bar', rows=len(stacked_bar_data)):
+                    chart_stacked_bar = charts.stacked_bar_chart(stacked_bar_data, customer_order, selectable=True)
+                    bar_event = st.altair_chart(chart_stacked_bar, use_container_width=True, on_select="rerun", key="stacked_bar_chart")
+                bar_selection = bar_event.selection.get(charts.CUSTOMER_SELECTION) or []
+                if bar_selection:
+                    bar_customer = bar_selection[0].get('customer')
             else:
                 st.info("Thiếu dữ liệu 'customer' hoặc 'service_type' để tạo biểu đồ stacked bar.")
 
         with layout_cols[1]:
             st.subheader("🍩 Top 5 Khách Hàng Dư Nợ Lớn Nhất")
             if not df.empty and 'customer' in df.columns:
-                customer_total_ar = df.groupby('customer')['amount'].sum().reset_index()
-                customer_total_ar_sorted = customer_total_ar.sort_values(by='amount', ascending=False)
-
-                top_5_customers = customer_total_ar_sorted.head(5)
-                if len(customer_total_ar_sorted) > 5:
-                    other_ar_sum = customer_total_ar_sorted.iloc[5:]['amount'].sum()
-                    if other_ar_sum > 0:
-                        others_df = pd.DataFrame([{'customer': 'Khách Hàng Khác', 'amount': other_ar_sum}])
-                        pie_data = pd.concat([top_5_customers, others_df], ignore_index=True)
-                    else:
-                        pie_data = top_5_customers
-                else:
-                    pie_data = top_5_customers
-
-                chart_pie = alt.Chart(pie_data).mark_arc(innerRadius=60, outerRadius=120).encode(
-                    theta=alt.Theta(field="amount", type="quantitative", stack=True),
-                    color=alt.Color(field="customer", type="nominal", title="Khách Hàng"),
-                    tooltip=[
-                        alt.Tooltip('customer:N', title='Khách Hàng'),
-                        alt.Tooltip('amount:Q', title='Dư Nợ', format=',.0f')
-                    ]
-                ).properties(
-                    height=430,
-                    title='Tỷ trọng dư nợ của Top 5 khách hàng'
-                )
-                st.altair_chart(chart_pie, use_container_width=True)
+                pie_data = artifacts['top_customers']
+                with profiler.stage('chart: top 5 khách hàng', rows=len(pie_data)):
+                    chart_pie = charts.top_customers_donut(pie_data)
+                    st.altair_chart(chart_pie, use_container_width=True)
             else:
                 st.info("Thiếu dữ liệu 'customer' để tạo biểu đồ tròn.")
 
         st.markdown("---")
-        number_formatter = JsCode("""
-            function formatNumberWithPoint(params) {
-                if (params.value == null || isNaN(params.value)) { 
-                    return ""; 
-                }
-                return Number(params.value).toLocaleString('vi-VN', {
-                    minimumFractionDigits: 0,
-                    maximumFractionDigits: 0
-                });
-            }""")
         aging_report_containter = st.columns([6, 2]) 
 
         with aging_report_containter[0]:
             st.subheader("🗓️ Báo Cáo Chi Tiết Công Nợ Phải Thu Theo Tuổi Nợ")
 
             if not df.empty and 'customer' in df.columns:
-                # --- Pivot table for aging report ---
-                aging_pivot = pd.pivot_table(
-                    df,
-                    index='customer',
-                    columns='age_category',
-                    values='amount',
-                    aggfunc='sum',
-                    fill_value=0
-                )
-
-                age_cols_ordered = ['Trong hạn', '1-30', '31-60', '61-90', 'Trên 90']
-                for col in age_cols_ordered:
-                    if col not in aging_pivot.columns:
-                        aging_pivot[col] = 0
-                aging_pivot = aging_pivot[age_cols_ordered] 
-
-                aging_pivot['Dư nợ'] = aging_pivot.sum(axis=1)
-                aging_pivot.reset_index(inplace=True)
-                aging_pivot = aging_pivot.rename(columns={'customer': 'Khách hàng'})
-                
-                final_cols_order = ['Khách hàng'] + age_cols_ordered + ['Dư nợ']
-                aging_pivot = aging_pivot[final_cols_order]
-                
-                aging_pivot_sorted = aging_pivot.sort_values(by='Dư nợ', ascending=False).copy()
-
-                # --- NEW: Prepare data for tooltips ---
-                # These _tooltip columns are added to the DataFrame to be referenced by tooltipField.
-                # They will be explicitly hidden from the grid display later.
-                if 'service_type' in df.columns: 
-                    service_breakdown_by_age = df.groupby(['customer', 'age_category', 'service_type'])['amount'].sum().reset_index()
-                    service_breakdown_total = df.groupby(['customer', 'service_type'])['amount'].sum().reset_index()
-
-                    for age_col in age_cols_ordered:
-                        aging_pivot_sorted[f'{age_col}_tooltip'] = None 
-                        for i, row in aging_pivot_sorted.iterrows():
-                            customer_name = row['Khách hàng']
-                            tooltip_df_age = service_breakdown_by_age[
-                                (service_breakdown_by_age['customer'] == customer_name) &
-                                (service_breakdown_by_age['age_category'] == age_col)
-                            ]
-                            aging_pivot_sorted.loc[i, f'{age_col}_tooltip'] = generate_tooltip_html(tooltip_df_age, 'amount')
-
-                    aging_pivot_sorted['Dư nợ_tooltip'] = None
-                    for i, row in aging_pivot_sorted.iterrows():
-                        customer_name = row['Khách hàng']
-                        tooltip_df_total = service_breakdown_total[service_breakdown_total['customer'] == customer_name]
-                        aging_pivot_sorted.loc[i, 'Dư nợ_tooltip'] = generate_tooltip_html(tooltip_df_total, 'amount')
-                # --- END NEW: Prepare data for tooltips ---
-
-
-                # --- START: MODIFICATION FOR PINNED TOTAL ROW ---
-                total_row_data = {'Khách hàng': 'TỔNG CỘNG'}
-                numeric_cols_to_sum = age_cols_ordered + ['Dư nợ']
-                
-                if not aging_pivot_sorted.empty: 
-                    total_sum_values = aging_pivot_sorted[numeric_cols_to_sum].sum()
-                    for col_name_sum in numeric_cols_to_sum: 
-                        total_row_data[col_name_sum] = int(total_sum_values[col_name_sum]) if pd.notna(total_sum_values[col_name_sum]) else 0
-                else: 
-                    for col_name_sum in numeric_cols_to_sum: 
-                        total_row_data[col_name_sum] = 0
-                # --- END: MODIFICATION FOR PINNED TOTAL ROW ---
-
-                gb = GridOptionsBuilder.from_dataframe(aging_pivot_sorted) 
-                gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=10)
-                gb.configure_default_column(filterable=True, sortable=True, resizable=True, aggFunc='sum')
-                
-                gb.configure_column("Khách hàng", headerName="Khách hàng", width=250, pinned='left',
-                                    cellStyle={'textAlign': 'left'})
-
-                currency_cols = age_cols_ordered + ['Dư nợ']
-                for col_name in currency_cols: 
-                    column_params = {
-                        "headerName": col_name.replace("_", " ").title(),
-                        "type": ["numericColumn", "numberColumnFilter"],
-                        "valueFormatter": number_formatter,
-                        "aggFunc": 'sum',
-                        "cellStyle": {'textAlign': 'right'}
-                    }
-                    tooltip_col_name = f'{col_name}_tooltip'
-                    if tooltip_col_name in aging_pivot_sorted.columns:
-                        column_params["tooltipField"] = tooltip_col_name
-                    
-                    gb.configure_column(col_name, **column_params)
-
-                # MODIFICATION: Explicitly hide the auxiliary tooltip data columns from display
-                # These columns are present in aging_pivot_sorted for tooltipField to access,
-                # but they should not be rendered as visible grid columns.
-                for col_in_df in aging_pivot_sorted.columns:
-                    if col_in_df.endswith('_tooltip'):
-                        gb.configure_column(col_in_df, hide=True)
-
-
-                gridOptions = gb.build()
-                
-                gridOptions['enableBrowserTooltips'] = True 
-
-                gridOptions['pinnedBottomRowData'] = [total_row_data]
-                gridOptions['getRowStyle'] = JsCode("""
-                    function(params) {
-                        if (params.node.isRowPinned && params.node.rowPinned === 'bottom') {
-                            return { 'font-weight': 'bold' };
-                        }
-                    }
-                """)
-
-                AgGrid(
-                    aging_pivot_sorted, 
-                    gridOptions=gridOptions,
-                    height=650,
-                    width='100%',
-                    fit_columns_on_grid_load=False, 
-                    allow_unsafe_jscode=True,
-                    enable_enterprise_modules=False, 
-                    update_mode=GridUpdateMode.MODEL_CHANGED,
-                    key='aging_grid_v_tooltips_hidden' # Changed key
+                # --- Pivot table for aging report (kèm cột *_tooltip, cache cùng pivot) ---
+                # These _tooltip columns are referenced by tooltipField and hidden from the grid display later.
+                aging_pivot_sorted = engine.aging_pivot(artifacts, tooltips=True)
+
+                # --- Chế độ phân trang phía server: chỉ gửi trang đang xem + dòng tổng cộng ---
+                server_side_grid = st.toggle(
+                    "Phân trang phía server",
+                    value=len(aging_pivot_sorted) > grid_data.SERVER_SIDE_THRESHOLD,
+                    help="Lọc, sắp xếp trên server và chỉ gửi các dòng của trang đang xem sang trình duyệt."
                 )
+                if server_side_grid:
+                    grid_controls = st.columns([4, 3, 2, 2])
+                    customer_search = grid_controls[0].text_input("Tìm khách hàng:", "")
+                    sort_options = report.AMOUNT_COLUMNS + [report.CUSTOMER_COLUMN]
+                    sort_by = grid_controls[1].selectbox("Sắp xếp theo:", sort_options, index=sort_options.index(report.TOTAL_COLUMN))
+                    sort_ascending = grid_controls[2].selectbox("Thứ tự:", ["Giảm dần", "Tăng dần"]) == "Tăng dần"
+                    page_size = grid_controls[3].selectbox("Số dòng/trang:", grid_data.PAGE_SIZE_OPTIONS)
+
+                    artifacts.bind(grid_query=(customer_search.strip().lower(), sort_by, sort_ascending))
+                    grid_positions = artifacts['grid_positions']
+                    n_pages = grid_data.page_count(len(grid_positions), page_size)
+                    # Key thay đổi theo truy vấn để quay về trang 1 khi lọc/sắp xếp lại
+                    page = st.number_input(
+                        f"Trang (1-{n_pages}, {len(grid_positions):,} khách hàng):", min_value=1, max_value=n_pages, value=1,
+                        key=f"grid_page_{customer_search}_{sort_by}_{sort_ascending}_{page_size}"
+                    )
+                    artifacts.bind(grid_page=(page, page_size))
+                else:
+                    artifacts.bind(grid_query=None, grid_page=None)
+
+                grid_frame = artifacts['grid_frame']
+                gridOptions = artifacts['grid_options']
+
+                with profiler.stage('AgGrid', rows=len(grid_frame)):
+                    grid_response = AgGrid(
+                        grid_frame, 
+                        gridOptions=gridOptions,
+                        height=650,
+                        width='100%',
+                        fit_columns_on_grid_load=False, 
+                        allow_unsafe_jscode=True,
+                        enable_enterprise_modules=False, 
+                        update_mode=GridUpdateMode.MODEL_CHANGED,
+                        key='aging_grid_v_tooltips_hidden' # Changed key
+                    )
+                selected_rows = grid_response.selected_rows
+                if selected_rows is not None and not selected_rows.empty:
+                    grid_customer = selected_rows[report.CUSTOMER_COLUMN].iloc[0]
             else:
                 st.info("Thiếu dữ liệu 'customer' để tạo báo cáo tuổi nợ.")
             with aging_report_containter[1]:
             # --- Biểu đồ cột cho tổng hợp tuổi nợ (Altair Chart) ---
-                aging_summary_data_for_chart = df.groupby('age_category')['amount'].sum().reset_index()
-                aging_summary_data_for_chart = aging_summary_data_for_chart.rename(columns={'age_category': 'Tuổi Nợ', 'amount': 'Tổng Số Tiền'})
-                
-                aging_summary_data_for_chart['Tuổi Nợ'] = pd.Categorical(aging_summary_data_for_chart['Tuổi Nợ'], categories=age_cols_ordered, ordered=True)
-                aging_summary_data_for_chart = aging_summary_data_for_chart.sort_values('Tuổi Nợ')
-
-
-                chart_aging_bar_horizontal = alt.Chart(aging_summary_data_for_chart).mark_bar().encode(
-                    y=alt.Y('Tuổi Nợ:N', sort=None, title='Nhóm Tuổi Nợ'),
-                    x=alt.X('Tổng Số Tiền:Q', title='Tổng Dư Nợ (VNĐ)', axis=alt.Axis(format='~s')),
-                    color=alt.Color('Tuổi Nợ:N', legend=None, scale=alt.Scale(scheme='tableau10')), 
-                    tooltip=[
-                        alt.Tooltip('Tuổi Nợ:N', title='Nhóm Tuổi Nợ'),
-                        alt.Tooltip('Tổng Số Tiền:Q', title='Tổng Dư Nợ', format=',.0f')
-                    ]
-                ).properties(
-                    title='Tổng Quan Công Nợ Phải Thu Theo Tuổi Nợ (Ngang)',
+                with profiler.stage('chart: tuổi nợ', rows=len(chart_frames.aging_summary)):
+                    st.altair_chart(charts.aging_bar_chart(chart_frames.aging_summary), use_container_width=True)
+
+        # --- Chi tiết hóa đơn của khách hàng được chọn (tra chỉ mục theo khách hàng, không lọc lại cả sổ) ---
+        # Chỉ đổi khách hàng đang xem khi lựa chọn trên grid/biểu đồ thực sự thay đổi
+        for pick_source, picked_customer in (('grid', grid_customer), ('bar', bar_customer)):
+            if picked_customer != st.session_state.get(f'drilldown_last_{pick_source}'):
+                st.session_state[f'drilldown_last_{pick_source}'] = picked_customer
+                if picked_customer is not None and picked_customer != chart_data.OTHERS_LABEL:
+                    st.session_state['drilldown_customer'] = picked_customer
+
+        drilldown_customer = st.session_state.get('drilldown_customer')
+        if drilldown_customer is not None:
+            customer_index = artifacts['customer_index']
+            with profiler.stage('drill-down') as timing:
+                invoices = drilldown.customer_invoices(artifacts['normalized'], customer_index, drilldown_customer, as_of_date)
+                timing.rows = len(invoices)
+            if invoices.empty: # Khách hàng không có trong dữ liệu hiện tại (vd. đã đổi file)
+                del st.session_state['drilldown_customer']
+            else:
+                st.markdown("---")
+                drilldown_header = st.columns([8, 1])
+                drilldown_header[0].subheader(f"🔎 Chi Tiết Hóa Đơn: {drilldown_customer}")
+                if drilldown_header[1].button("✖ Đóng", key="drilldown_close"):
+                    del st.session_state['drilldown_customer']
+                    st.rerun()
+                overdue_amount = invoices.loc[invoices['days_overdue'] > 0, 'amount'].sum()
+                st.caption(
+                    f"{len(invoices):,} hóa đơn · Tổng dư nợ {format_vnd(invoices['amount'].sum())} VNĐ · "
+                    f"Quá hạn {format_vnd(overdue_amount)} VNĐ · Sắp xếp theo số ngày quá hạn giảm dần"
                 )
-                
-                text_horizontal = chart_aging_bar_horizontal.mark_text(
-                    align='left',
-                    baseline='middle',
-                    dx=5 
-                ).encode(
-                    text=alt.Text('Tổng Số Tiền:Q', format='~s')
+                st.dataframe(
+                    export.invoice_table(invoices), hide_index=True, use_container_width=True,
+                    column_config={
+                        'Ngày đến hạn': st.column_config.DateColumn(format="DD/MM/YYYY"),
+                        'Số tiền': st.column_config.NumberColumn(format="localized"),
+                    }
                 )
-                st.altair_chart(chart_aging_bar_horizontal + text_horizontal, use_container_width=True)
+
+        # --- Xuất báo cáo: dựng từ báo cáo đã cache, file chỉ được tạo khi bấm tải xuống ---
+        st.markdown("---")
+        st.subheader("📥 Xuất Báo Cáo Tuổi Nợ")
+        export_controls = st.columns([3, 3, 2])
+        export_format = export.EXPORT_FORMATS[export_controls[0].selectbox("Định dạng:", list(export.EXPORT_FORMATS))]
+        include_invoices = export_controls[1].checkbox(
+            "Kèm chi tiết từng hóa đơn", value=True,
+            help="Thêm bảng chi tiết hóa đơn kèm số ngày quá hạn và nhóm tuổi nợ. Với sổ rất lớn nên chọn CSV hoặc Parquet."
+        )
+        export_controls[2].download_button(
+            "⬇️ Tải báo cáo",
+            data=lambda: export.export_bytes(export.export_tables(
+                artifacts['report'], artifacts['chart_frames'].customer_service,
+                artifacts['aged'] if include_invoices else None
+            ), export_format),
+            file_name=export.export_file_name(f"bao_cao_tuoi_no_{as_of_date:%Y%m%d}", export_format),
+            mime=export.EXPORT_MIME_TYPES[export_format]
+        )
+
+        # --- Xu hướng tuổi nợ tại nhiều ngày chốt (tính một lần, không lặp pivot theo ngày) ---
+        if trend_mode:
+            st.markdown("---")
+            st.subheader("📉 Xu Hướng Công Nợ Theo Tuổi Nợ")
+            trend_dates = aging.period_end_dates(as_of_date, trend_periods, TREND_FREQUENCIES[trend_frequency])
+            artifacts.bind(trend_dates=pipeline.Input(tuple(trend_dates), trend_dates))
+            trend_data = artifacts['aging_trend']
+            with profiler.stage('chart: xu hướng', rows=len(trend_data), note=f'{len(trend_dates)} ngày chốt'):
+                st.altair_chart(charts.aging_trend_chart(trend_data), use_container_width=True)
+            st.caption("Tuổi nợ tại mỗi ngày chốt được tính trên số dư hiện tại của từng hóa đơn (file không có lịch sử thanh toán).")
 
 
 
@@ -390,11 +421,7 @@ if uploaded_file and sheet_name_selected:
     except pd.errors.EmptyDataError:
         st.error(f"Lỗi: Sheet '{sheet_name_selected}' trống hoặc không có dữ liệu.")
     except KeyError as e:
-        st.error(f"Lỗi: Không tìm thấy cột cần thiết trong file Excel: {e}. Vui lòng kiểm tra lại tên cột trong file của bạn so với các tên cột mặc định được mong đợi: {', '.join(required_columns.values())}.")
-        if 'df_raw' in locals() and df_raw is not None: 
-             st.error(f"Các cột tìm thấy trong sheet '{sheet_name_selected}': {', '.join(df_raw.columns)}")
-        else:
-             st.error(f"Không thể đọc các cột từ sheet '{sheet_name_selected}'.")
+        st.error(f"Lỗi: Không tìm thấy cột cần thiết trong file Excel: {e}. Vui lòng kiểm tra lại tên cột trong file của bạn so với các tên cột mặc định được mong đợi: {', '.join(ingest.REQUIRED_COLUMNS.values())}.")
     except ValueError as e:
         st.error(f"Lỗi dữ liệu: {e}. Vui lòng kiểm tra định dạng dữ liệu trong các cột, đặc biệt là cột ngày và số tiền.")
     except Exception as e:
@@ -402,7 +429,25 @@ if uploaded_file and sheet_name_selected:
         st.exception(e) 
         st.error("Vui lòng kiểm tra lại cấu trúc file Excel, tên các cột và định dạng dữ liệu.")
 
-elif uploaded_file and not sheet_name_selected and xls and xls.sheet_names:
+    # --- Panel chẩn đoán hiệu năng ---
+    if profiler.enabled:
+        profile_context = {
+            'source': snapshot_selected.source_name if snapshot_selected is not None
+            else ", ".join(dict.fromkeys(part.source_name for part in selected_parts)),
+            'sheet': sheet_name_selected,
+            'streaming': streaming_read,
+        }
+        with st.expander(f"🩺 Chẩn đoán hiệu năng — tổng {profiler.total_seconds:,.2f}s", expanded=False):
+            st.dataframe(profiler.to_frame(), hide_index=True, use_container_width=True)
+            st.download_button(
+                "⬇️ Tải log JSON", profiler.to_json(indent=2, **profile_context),
+                file_name=f"profile_{profiler.started_at:%Y%m%d_%H%M%S}.json", mime="application/json"
+            )
+        profile_log_path = profiling.log_path_from_env()
+        if profile_log_path:
+            profiler.write_log(profile_log_path, **profile_context)
+
+elif uploaded_files and not selected_parts:
     st.info("Vui lòng chọn một sheet từ file Excel đã tải lên ở thanh bên trái.")
 else:
     st.info("👋 Chào mừng! Vui lòng tải lên file Excel báo cáo công nợ để bắt đầu phân tích.")
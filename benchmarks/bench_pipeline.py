@@ -0,0 +1,182 @@
+"""
+Đo thời gian và bộ nhớ của từng bước xử lý trong dashboard trên sổ công nợ giả lập.
+
+    python -m benchmarks.bench_pipeline                          # 10k, 100k, 1M dòng
+    python -m benchmarks.bench_pipeline --rows 10000 -o out.json
+    python -m benchmarks.bench_pipeline --compare old.json new.json
+
+Mỗi bước được đo thời gian (lấy lần nhanh nhất trong --repeat lần chạy) rồi chạy thêm
+một lần dưới tracemalloc để lấy bộ nhớ cấp phát đỉnh, nên số đo thời gian không bị
+ảnh hưởng bởi tracemalloc. Kết quả ghi ra JSON để so sánh giữa các revision.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from receivables import aging, chart_data, ingest, report
+
+from .synthetic import ledger_workbook
+
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+AS_OF = '2026-01-01'
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(fn, repeat=1, track_memory=True):
+    """Chạy fn và trả về (kết quả, số giây nhanh nhất, bộ nhớ cấp phát đỉnh hoặc None)."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak_bytes = None
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak_bytes
+
+
+def _chart_specs(aged_df):
+    from receivables import charts
+
+    frames = chart_data.aggregate_chart_data(aged_df)
+    bar_data, customer_order = chart_data.stacked_bar_data(frames, 20)
+    return [
+        charts.stacked_bar_chart(bar_data, customer_order).to_dict(),
+        charts.top_customers_donut(chart_data.top_customers_data(frames, 5)).to_dict(),
+        charts.aging_bar_chart(frames.aging_summary).to_dict(),
+    ]
+
+
+def _grid_options(aging_report):
+    from receivables import grid_data, grid_options
+
+    return grid_options.build_grid_options(aging_report, grid_data.total_row(aging_report))
+
+
+def run_stages(path, repeat=1, track_memory=True):
+    """Chạy lần lượt các bước trên một workbook; trả về danh sách kết quả theo bước."""
+    results = []
+
+    def record(stage, fn, rows_of=len):
+        try:
+            output, seconds, peak_bytes = measure(fn, repeat, track_memory)
+        except ImportError as e: # vd. thiếu altair/st_aggrid khi chạy ngoài môi trường dashboard
+            results.append({'stage': stage, 'skipped': str(e)})
+            return None
+        results.append({'stage': stage, 'seconds': seconds, 'peak_bytes': peak_bytes, 'rows_out': rows_of(output)})
+        return output
+
+    df_raw = record('excel_parse', lambda: pd.read_excel(path, sheet_name=0))
+
+    def resolve():
+        actual_columns, _, missing_cols = ingest.resolve_columns(df_raw.columns)
+        if missing_cols:
+            raise ingest.MissingColumnsError(missing_cols, df_raw.columns)
+        return df_raw[list(actual_columns.values())].rename(columns={v: k for k, v in actual_columns.items()})
+
+    renamed = record('column_resolution', resolve)
+    frame = record('coercion', lambda: ingest.clean_frame(renamed.copy()))
+    aged_df = record('aging', lambda: aging.age_frame(frame, AS_OF))
+    record('pivot', lambda: report.build_aging_pivot(aged_df))
+    record('tooltips', lambda: report.build_tooltips(aged_df))
+    record('chart_specs', lambda: _chart_specs(aged_df), rows_of=lambda specs: sum(
+        len(dataset) for spec in specs for dataset in spec.get('datasets', {}).values()
+    ))
+    aging_report = report.build_aging_report(aged_df)
+    record('grid_options', lambda: _grid_options(aging_report), rows_of=lambda options: len(options['columnDefs']))
+    return results
+
+
+def run(rows_list, data_dir, customers, seed, repeat, track_memory):
+    runs = []
+    for rows in rows_list:
+        start = time.perf_counter()
+        path = ledger_workbook(rows, data_dir, customers=customers, seed=seed, as_of=AS_OF)
+        print(f"[{rows:,} dòng] workbook: {path} ({time.perf_counter() - start:.1f}s)", flush=True)
+        for result in run_stages(path, repeat, track_memory):
+            result['rows'] = rows
+            runs.append(result)
+            if 'skipped' in result:
+                print(f"  {result['stage']:<18} bỏ qua ({result['skipped']})", flush=True)
+            else:
+                peak = f"{result['peak_bytes'] / 1024 ** 2:10.1f} MB" if result['peak_bytes'] is not None else ''
+                print(f"  {result['stage']:<18} {result['seconds']:9.3f}s {peak}", flush=True)
+    return {
+        'revision': git_revision(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'customers': customers,
+        'seed': seed,
+        'repeat': repeat,
+        'results': runs,
+    }
+
+
+def compare(old_path, new_path):
+    """In bảng so sánh thời gian từng bước giữa hai file kết quả."""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    old_times = {(r['rows'], r['stage']): r.get('seconds') for r in old['results']}
+    print(f"{'rows':>10} {'stage':<18} {old['revision']:>10} {new['revision']:>10} {'ratio':>7}")
+    for r in new['results']:
+        before, after = old_times.get((r['rows'], r['stage'])), r.get('seconds')
+        if before is None or after is None:
+            continue
+        print(f"{r['rows']:>10,} {r['stage']:<18} {before:>9.3f}s {after:>9.3f}s {after / before:>6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_pipeline', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS))
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="Số lần chạy mỗi bước, lấy lần nhanh nhất")
+    parser.add_argument('--no-memory', action='store_true', help="Bỏ qua lần chạy đo bộ nhớ bằng tracemalloc")
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'), help="Nơi lưu workbook giả lập")
+    parser.add_argument('-o', '--output', default=None, help="File JSON kết quả (mặc định: benchmarks/results/<revision>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="So sánh hai file kết quả rồi thoát")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    summary = run(args.rows, args.data_dir, args.customers, args.seed, args.repeat, not args.no_memory)
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{summary['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"Đã ghi kết quả: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
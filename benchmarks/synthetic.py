@@ -0,0 +1,75 @@
+"""
+Sinh sổ công nợ giả lập có tính tất định (cùng seed → cùng dữ liệu) cho benchmark.
+
+Dữ liệu dùng đúng tên cột mặc định của dashboard (KhachHang, NgayDaoHan, SoTienPhaiThu,
+LoaiHinhDichVu) và có một tỷ lệ nhỏ dòng "bẩn" (số tiền <= 0, thiếu ngày/khách hàng)
+để bước làm sạch có việc để làm như với file thật.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SERVICE_TYPES = ('R', 'E', 'W', 'P', 'F')
+
+
+def generate_ledger(rows, customers=5000, service_types=SERVICE_TYPES, as_of='2026-01-01',
+                    due_min_days=-90, due_max_days=365, dirty_fraction=0.02, seed=0):
+    """
+    rows dòng hóa đơn; ngày đến hạn phân bố đều trong [as_of - due_max_days, as_of - due_min_days],
+    tức từ còn hạn due_min_days ngày tới quá hạn due_max_days ngày.
+    """
+    rng = np.random.default_rng(seed)
+    customer_names = np.array([f"Khách hàng {i:05d}" for i in range(customers)], dtype=object)
+    # Phân bố lệch: một số khách hàng lớn chiếm phần lớn hóa đơn, giống sổ thật
+    weights = 1.0 / np.arange(1, customers + 1) ** 0.8
+    customer_idx = rng.choice(customers, size=rows, p=weights / weights.sum())
+
+    days_overdue = rng.integers(due_min_days, due_max_days + 1, size=rows)
+    due_dates = pd.Timestamp(as_of).normalize() - pd.to_timedelta(days_overdue, unit='D')
+    amounts = np.round(rng.lognormal(mean=15, sigma=1.2, size=rows), -3)
+
+    df = pd.DataFrame({
+        'KhachHang': customer_names[customer_idx],
+        'NgayDaoHan': due_dates,
+        'SoTienPhaiThu': amounts,
+        'LoaiHinhDichVu': rng.choice(np.array(service_types, dtype=object), size=rows),
+    })
+
+    n_dirty = int(rows * dirty_fraction)
+    if n_dirty:
+        dirty = rng.choice(rows, size=n_dirty, replace=False)
+        thirds = np.array_split(dirty, 3)
+        df.loc[thirds[0], 'SoTienPhaiThu'] = 0
+        df.loc[thirds[1], 'NgayDaoHan'] = pd.NaT
+        df.loc[thirds[2], 'KhachHang'] = None
+    return df
+
+
+def write_excel(df, path, sheet_name='CongNo'):
+    """Ghi ra .xlsx bằng chế độ write-only của openpyxl (nhanh và ít bộ nhớ hơn DataFrame.to_excel)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append(list(df.columns))
+    columns = [
+        [None if pd.isna(value) else value for value in (df[col].dt.to_pydatetime() if col == 'NgayDaoHan' else df[col])]
+        for col in df.columns
+    ]
+    for row in zip(*columns):
+        worksheet.append(row)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook.save(path)
+    return path
+
+
+def ledger_workbook(rows, data_dir, **kwargs):
+    """Đường dẫn workbook giả lập cho số dòng và tham số đã cho; chỉ sinh file nếu chưa có."""
+    params = json.dumps(sorted(kwargs.items()), default=str).encode('utf-8')
+    path = os.path.join(data_dir, f"ledger_{rows}_{hashlib.blake2b(params, digest_size=4).hexdigest()}.xlsx")
+    if not os.path.exists(path):
+        write_excel(generate_ledger(rows, **kwargs), path)
+    return path
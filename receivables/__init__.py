@@ -0,0 +1,26 @@
+"""
+Các thành phần xử lý dữ liệu công nợ dùng chung cho dashboard và CLI.
+
+Các hàm của engine được nạp lười (PEP 562) để `python -m receivables` khởi động
+nhanh; dashboard import trực tiếp các module con cần dùng.
+"""
+_ENGINE_EXPORTS = (
+    'AgingReport',
+    'load_ledger',
+    'ledger_key',
+    'normalize_ledger',
+    'age_ledger',
+    'report_artifacts',
+    'aging_pivot',
+    'compute_kpis',
+    'run_report',
+)
+
+__all__ = list(_ENGINE_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _ENGINE_EXPORTS:
+        from . import engine
+        return getattr(engine, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
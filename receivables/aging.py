@@ -0,0 +1,103 @@
+"""
+Tính tuổi nợ theo vector cho toàn bộ frame công nợ.
+
+Các nhóm tuổi nợ được khai báo dưới dạng dữ liệu (AGE_BUCKETS) thay vì chuỗi if/elif,
+nên dashboard và các job chạy nền dùng chung một định nghĩa.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# (nhãn, số ngày quá hạn tối đa của nhóm); None = không giới hạn trên
+AGE_BUCKETS = (
+    ('Trong hạn', 0),
+    ('1-30', 30),
+    ('31-60', 60),
+    ('61-90', 90),
+    ('Trên 90', None),
+)
+
+AGE_LABELS = [label for label, _ in AGE_BUCKETS]
+AGE_DTYPE = pd.CategoricalDtype(AGE_LABELS, ordered=True)
+
+
+def as_of_timestamp(as_of=None):
+    """Chuẩn hóa ngày chốt tuổi nợ về 00:00; mặc định là ngày hôm nay."""
+    if as_of is None:
+        as_of = datetime.now().date()
+    return pd.Timestamp(as_of).normalize()
+
+
+def compute_days_overdue(due_dates, as_of=None):
+    """Số ngày quá hạn tính đến ngày chốt (âm hoặc 0 nghĩa là còn trong hạn)."""
+    return (as_of_timestamp(as_of) - pd.to_datetime(due_dates)).dt.days
+
+
+def bucket_codes(days_overdue, buckets=AGE_BUCKETS):
+    """Chỉ số nhóm tuổi nợ cho từng giá trị days_overdue (-1 nếu thiếu dữ liệu)."""
+    upper_bounds = np.array([limit for _, limit in buckets if limit is not None], dtype='float64')
+    days = np.asarray(days_overdue, dtype='float64')
+    codes = np.searchsorted(upper_bounds, days, side='left')
+    return np.where(np.isnan(days), -1, codes).astype('int8')
+
+
+def categorize_days(days_overdue, buckets=AGE_BUCKETS):
+    """Phân loại tuổi nợ thành Categorical có thứ tự theo buckets."""
+    dtype = AGE_DTYPE if buckets is AGE_BUCKETS else pd.CategoricalDtype([label for label, _ in buckets], ordered=True)
+    categories = pd.Categorical.from_codes(bucket_codes(days_overdue, buckets), dtype=dtype)
+    if isinstance(days_overdue, pd.Series):
+        return pd.Series(categories, index=days_overdue.index, name='age_category')
+    return categories
+
+
+def age_frame(df, as_of=None, buckets=AGE_BUCKETS):
+    """
+    Trả về bản sao của df có thêm cột 'days_overdue' và 'age_category'.
+    df phải có cột 'due_date'; frame gốc không bị sửa.
+    """
+    days_overdue = compute_days_overdue(df['due_date'], as_of)
+    return df.assign(days_overdue=days_overdue, age_category=categorize_days(days_overdue, buckets))
+
+
+def period_end_dates(as_of=None, periods=12, freq='ME'):
+    """
+    periods ngày chốt kết thúc tại as_of: ngày cuối các kỳ (tháng 'ME', quý 'QE', tuần 'W-SUN')
+    trước đó, và chính as_of nếu nó không rơi đúng ngày cuối kỳ.
+    """
+    as_of = as_of_timestamp(as_of)
+    dates = pd.date_range(end=as_of, periods=periods, freq=freq)
+    if len(dates) and dates[-1] != as_of:
+        dates = dates[1:].append(pd.DatetimeIndex([as_of]))
+    return dates
+
+
+def aging_trend(df, as_of_dates, buckets=AGE_BUCKETS):
+    """
+    Tổng dư nợ theo nhóm tuổi nợ tại nhiều ngày chốt, tính trong một lần cho mọi ngày.
+
+    due_date được sắp xếp một lần và lấy tổng tích lũy của amount. Nhóm có giới hạn L chứa
+    các dòng có days_overdue <= L, tức due_date > ngày chốt - (L + 1) ngày, nên tổng của mọi
+    (ngày chốt × mốc nhóm) là các phép tra searchsorted trên mảng đã sắp xếp, không phải
+    tính lại tuổi nợ cho từng ngày. Kết quả khớp với age_frame tại từng ngày chốt.
+    Số tiền là số dư hiện tại của từng dòng (sổ không lưu lịch sử thanh toán).
+    Trả về frame index 'as_of', mỗi nhóm tuổi nợ một cột.
+    """
+    as_of = pd.DatetimeIndex([as_of_timestamp(date) for date in as_of_dates], name='as_of')
+    due_dates = df['due_date'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(due_dates) # Dòng thiếu ngày đến hạn không thuộc nhóm nào, như categorize_days
+    due = due_dates[valid].view('int64')
+    order = np.argsort(due, kind='stable')
+    due_sorted = due[order]
+    amounts = df['amount'].to_numpy(dtype='float64')[valid]
+    cumulative = np.concatenate([[0.0], np.cumsum(amounts[order])])
+    total = cumulative[-1]
+
+    day_ns = np.int64(24 * 60 * 60 * 10 ** 9)
+    limits = np.array([limit for _, limit in buckets if limit is not None], dtype='int64')
+    thresholds = as_of.to_numpy(dtype='datetime64[ns]').view('int64')[:, None] - (limits[None, :] + 1) * day_ns
+    # Tổng dư nợ có days_overdue <= từng giới hạn, shape (ngày chốt, số mốc)
+    at_most = total - cumulative[np.searchsorted(due_sorted, thresholds, side='right')]
+    at_most = np.column_stack([at_most, np.full(len(as_of), total)])
+    per_bucket = np.diff(at_most, axis=1, prepend=0.0)
+    return pd.DataFrame(per_bucket, index=as_of, columns=[label for label, _ in buckets])
@@ -0,0 +1,156 @@
+"""
+Nạp nhiều workbook / nhiều sheet cùng lúc và gộp thành một frame công nợ.
+
+Các file có sheet chưa nằm trong cache được parse song song trên nhiều tiến trình
+(ProcessPoolExecutor, mỗi file một tác vụ nên nội dung file chỉ gửi sang tiến trình con
+một lần). Tiến trình con khởi tạo bằng forkserver/spawn: fork bên trong server Streamlit
+nhiều luồng có thể treo vì sao chép cả các khóa đang bị giữ. Mỗi phần đi qua cùng bước
+nhận diện cột và làm sạch như khi đọc một sheet, được gắn cột 'source' (chi nhánh / file
+nguồn) rồi ghép lại. Lỗi của từng file được ghi nhận riêng, không làm hỏng cả lô.
+"""
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .cache import frame_nbytes, shared_cache
+from .ingest import NormalizedSheet, cache_sheet, cached_sheet, content_digest, is_xlsx, parse_sheet
+from .mappings import find_mapping
+
+SOURCE_COLUMN = 'source'
+
+
+@dataclass
+class BatchPart:
+    source_name: str # Tên file tải lên
+    data: bytes
+    digest: str
+    sheet_name: str
+
+
+@dataclass
+class BatchResult:
+    sheet: NormalizedSheet # Frame đã gộp, có thêm cột SOURCE_COLUMN
+    digest: str            # Khóa đại diện cho cả lô, dùng như mã băm của một file
+    part_rows: dict = field(default_factory=dict) # {nhãn nguồn: số dòng hợp lệ}
+    failures: dict = field(default_factory=dict)  # {nhãn nguồn: thông báo lỗi}
+
+
+def _parse_part(data, sheet_name, streaming, mapping=None):
+    """Trả về (sheet, None) hoặc (None, thông báo lỗi)."""
+    try:
+        return parse_sheet(data, sheet_name, streaming, mapping=mapping), None
+    except Exception as e: # Lỗi được chuyển về dạng chuỗi để luôn pickle được
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _parse_file(data, sheets, streaming):
+    """Chạy trong tiến trình con: parse các sheet [(tên sheet, cấu hình cột)] của cùng một file."""
+    return [_parse_part(data, sheet_name, streaming, mapping) for sheet_name, mapping in sheets]
+
+
+def _process_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def part_labels(parts):
+    """Nhãn nguồn cho từng phần: tên file (bỏ đuôi), thêm tên sheet nếu chọn nhiều sheet của cùng file."""
+    sheets_per_file = Counter(part.source_name for part in parts)
+    labels = []
+    for part in parts:
+        label = os.path.splitext(part.source_name)[0]
+        if sheets_per_file[part.source_name] > 1:
+            label = f"{label} / {part.sheet_name}"
+        labels.append(label)
+    return labels
+
+
+def batch_digest(parts, mappings=None):
+    """Khóa của cả lô; gồm cấu hình cột của từng phần vì cấu hình khác có thể cho frame khác."""
+    mappings = mappings or [None] * len(parts)
+    return content_digest("|".join(
+        f"{part.digest}:{part.sheet_name}:{mapping.cache_token if mapping is not None else ''}"
+        for part, mapping in zip(parts, mappings)
+    ).encode('utf-8'))
+
+
+def load_batch(parts, streaming=False, max_workers=None):
+    """
+    Đọc các phần (file, sheet) chưa có trong cache song song theo từng file rồi gộp lại.
+    Kết quả gộp cũng được cache theo batch_digest(parts, cấu hình cột của từng phần).
+    """
+    mappings = [find_mapping(part.data, part.sheet_name, part.digest) for part in parts]
+    digest = batch_digest(parts, mappings)
+    key = ("batch", digest, streaming)
+    cached = shared_cache.get(key)
+    if cached is not None:
+        return cached
+
+    labels = part_labels(parts)
+    sheets = [
+        cached_sheet(part.digest, part.sheet_name, mapping, streamed=streaming and is_xlsx(part.data))
+        for part, mapping in zip(parts, mappings)
+    ]
+    failures = {}
+    pending = {} # {mã băm file: [vị trí phần]}
+    for i, sheet in enumerate(sheets):
+        if sheet is None:
+            pending.setdefault(parts[i].digest, []).append(i)
+
+    outcomes = {}
+    if len(pending) > 1 and max_workers != 1:
+        max_workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=_process_context()) as executor:
+            futures = {
+                tuple(indexes): executor.submit(
+                    _parse_file, parts[indexes[0]].data,
+                    [(parts[i].sheet_name, mappings[i]) for i in indexes], streaming,
+                )
+                for indexes in pending.values()
+            }
+            for indexes, future in futures.items():
+                try:
+                    outcomes.update(zip(indexes, future.result()))
+                except Exception as e: # vd. BrokenProcessPool khi tiến trình con bị kill
+                    outcomes.update((i, (None, f"{type(e).__name__}: {e}")) for i in indexes)
+    else:
+        for indexes in pending.values():
+            outcomes.update(zip(indexes, _parse_file(
+                parts[indexes[0]].data, [(parts[i].sheet_name, mappings[i]) for i in indexes], streaming,
+            )))
+
+    for i, (sheet, error) in outcomes.items():
+        if error is not None:
+            failures[labels[i]] = error
+            continue
+        cache_sheet(parts[i].digest, parts[i].sheet_name, sheet, mappings[i])
+        sheets[i] = sheet
+
+    frames = []
+    part_rows = {}
+    column_notes = []
+    has_service_type = True
+    for label, sheet in zip(labels, sheets):
+        if sheet is None:
+            continue
+        frames.append(sheet.frame.assign(**{SOURCE_COLUMN: label}))
+        part_rows[label] = len(sheet.frame)
+        column_notes.extend((f"{label}: {actual_name}", default_name) for actual_name, default_name in sheet.column_notes)
+        has_service_type = has_service_type and sheet.has_service_type
+
+    if frames:
+        consolidated = pd.concat(frames, ignore_index=True)
+        consolidated[SOURCE_COLUMN] = pd.Categorical(consolidated[SOURCE_COLUMN], categories=list(part_rows))
+    else:
+        consolidated = pd.DataFrame(columns=['customer', 'due_date', 'amount', 'service_type', SOURCE_COLUMN])
+
+    nbytes = frame_nbytes(consolidated)
+    result = BatchResult(NormalizedSheet(consolidated, column_notes, has_service_type, nbytes), digest, part_rows, failures)
+    if not failures:
+        # Lô có lỗi không được cache để lần chạy sau thử đọc lại các file lỗi
+        shared_cache.put(key, result, nbytes)
+    return result
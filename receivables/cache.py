@@ -0,0 +1,60 @@
+"""
+Cache dùng chung trong process cho dữ liệu đã parse và các bảng dẫn xuất.
+
+Biến cấp module tồn tại suốt vòng đời process Streamlit nên được chia sẻ giữa các
+session. Dung lượng tối đa cấu hình qua biến môi trường AR_CACHE_MAX_MB.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_MAX_BYTES = int(os.environ.get("AR_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+class FrameCache:
+    """Cache LRU thread-safe, loại bỏ phần tử cũ nhất khi vượt quá max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return # Quá lớn để cache, trả về cho người gọi mà không lưu
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def frame_nbytes(df):
+    """Dung lượng bộ nhớ thực tế của DataFrame (kể cả chuỗi)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+shared_cache = FrameCache(CACHE_MAX_BYTES)
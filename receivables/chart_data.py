@@ -0,0 +1,82 @@
+"""
+Dữ liệu đã tổng hợp sẵn cho các biểu đồ của dashboard.
+
+Các biểu đồ Altair chỉ nhận những frame nhỏ này thay vì toàn bộ dòng hóa đơn, nên
+kích thước spec Vega-Lite phụ thuộc vào số điểm trên biểu đồ chứ không phụ thuộc
+vào số dòng của sổ công nợ.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .aging import AGE_DTYPE, aging_trend
+from .cache import frame_nbytes
+
+OTHERS_LABEL = 'Khách Hàng Khác'
+
+
+@dataclass
+class ChartFrames:
+    customer_service: pd.DataFrame # customer, service_type, amount
+    customer_totals: pd.DataFrame  # customer, amount (giảm dần theo amount)
+    aging_summary: pd.DataFrame    # 'Tuổi Nợ', 'Tổng Số Tiền' (theo thứ tự nhóm tuổi nợ)
+
+    @property
+    def nbytes(self):
+        return frame_nbytes(self.customer_service) + frame_nbytes(self.customer_totals) + frame_nbytes(self.aging_summary)
+
+
+def aggregate_chart_data(aged_df):
+    """Một bước tổng hợp dùng chung cho mọi biểu đồ (cache như artifact 'chart_frames')."""
+    customer_service = aged_df.groupby(['customer', 'service_type'], observed=True)['amount'].sum().reset_index()
+    customer_totals = (
+        customer_service.groupby('customer', observed=True)['amount'].sum()
+        .sort_values(ascending=False)
+        .reset_index()
+    )
+    aging_summary = aged_df.groupby('age_category', observed=True)['amount'].sum().reset_index()
+    aging_summary = aging_summary.rename(columns={'age_category': 'Tuổi Nợ', 'amount': 'Tổng Số Tiền'})
+    aging_summary['Tuổi Nợ'] = aging_summary['Tuổi Nợ'].astype(AGE_DTYPE)
+    aging_summary = aging_summary.sort_values('Tuổi Nợ').reset_index(drop=True)
+
+    return ChartFrames(customer_service, customer_totals, aging_summary)
+
+
+def stacked_bar_data(frames, top_n=None):
+    """
+    Dữ liệu cho biểu đồ stacked bar khách hàng × loại hình dịch vụ.
+    Khi top_n được đặt, các khách hàng ngoài top_n được gộp vào OTHERS_LABEL.
+    Trả về (frame, customer_order) với customer_order là thứ tự trục x.
+    """
+    customer_order = frames.customer_totals['customer'].tolist()
+    if top_n is None or len(customer_order) <= top_n:
+        return frames.customer_service, customer_order
+
+    top_customers = customer_order[:top_n]
+    is_top = frames.customer_service['customer'].isin(top_customers)
+    others = frames.customer_service[~is_top].groupby('service_type', observed=True)['amount'].sum().reset_index()
+    others.insert(0, 'customer', OTHERS_LABEL)
+    bar_data = pd.concat([frames.customer_service[is_top], others], ignore_index=True)
+    return bar_data, top_customers + [OTHERS_LABEL]
+
+
+def top_customers_data(frames, n=5):
+    """Top n khách hàng dư nợ lớn nhất, phần còn lại gộp vào OTHERS_LABEL (nếu dương)."""
+    customer_totals = frames.customer_totals
+    top = customer_totals.head(n)
+    if len(customer_totals) > n:
+        other_ar_sum = customer_totals['amount'].iloc[n:].sum()
+        if other_ar_sum > 0:
+            others_df = pd.DataFrame([{'customer': OTHERS_LABEL, 'amount': other_ar_sum}])
+            return pd.concat([top, others_df], ignore_index=True)
+    return top
+
+
+def aging_trend_data(df, as_of_dates):
+    """Dữ liệu dạng dài ('Ngày chốt', 'Tuổi Nợ', 'Tổng Số Tiền') cho biểu đồ xu hướng tuổi nợ tại nhiều ngày chốt."""
+    trend = aging_trend(df, as_of_dates)
+    trend_data = trend.rename_axis('Ngày chốt').reset_index().melt(
+        id_vars='Ngày chốt', var_name='Tuổi Nợ', value_name='Tổng Số Tiền'
+    )
+    trend_data['Tuổi Nợ'] = trend_data['Tuổi Nợ'].astype(AGE_DTYPE)
+    return trend_data
@@ -0,0 +1,93 @@
+"""
+Biểu đồ Altair của dashboard, dựng từ các frame đã tổng hợp trong chart_data.
+
+Tách khỏi Receivable_rpt.py để có thể đo và dùng lại việc sinh spec Vega-Lite mà
+không cần chạy Streamlit. Engine/CLI không import module này.
+"""
+import altair as alt
+
+from .aging import AGE_LABELS
+
+CUSTOMER_SELECTION = 'customer_pick' # Tên selection khi bấm chọn khách hàng trên stacked bar
+
+
+def stacked_bar_chart(bar_data, customer_order, selectable=False):
+    """Stacked bar dư nợ theo khách hàng × loại hình dịch vụ; selectable=True cho phép bấm chọn một khách hàng."""
+    chart = alt.Chart(bar_data).mark_bar().encode(
+        x=alt.X('customer:N', sort=customer_order, title='Khách Hàng'),
+        y=alt.Y('amount:Q', title='Tổng Dư Nợ (VNĐ)', axis=alt.Axis(format='~s')),
+        color=alt.Color('service_type:N', title='Loại Hình Dịch Vụ'),
+        tooltip=[
+            alt.Tooltip('customer:N', title='Khách Hàng'),
+            alt.Tooltip('service_type:N', title='Loại Dịch Vụ'),
+            alt.Tooltip('amount:Q', title='Dư Nợ', format=',.0f')
+        ]
+    ).properties(
+        height=450,
+        title='Tổng công nợ của từng khách hàng theo loại hình dịch vụ'
+    )
+    if selectable:
+        customer_pick = alt.selection_point(name=CUSTOMER_SELECTION, fields=['customer'])
+        chart = chart.add_params(customer_pick).encode(
+            opacity=alt.condition(customer_pick, alt.value(1.0), alt.value(0.35))
+        )
+    return chart
+
+
+def top_customers_donut(pie_data):
+    """Biểu đồ donut tỷ trọng dư nợ của top khách hàng."""
+    return alt.Chart(pie_data).mark_arc(innerRadius=60, outerRadius=120).encode(
+        theta=alt.Theta(field="amount", type="quantitative", stack=True),
+        color=alt.Color(field="customer", type="nominal", title="Khách Hàng"),
+        tooltip=[
+            alt.Tooltip('customer:N', title='Khách Hàng'),
+            alt.Tooltip('amount:Q', title='Dư Nợ', format=',.0f')
+        ]
+    ).properties(
+        height=430,
+        title='Tỷ trọng dư nợ của Top 5 khách hàng'
+    )
+
+
+def aging_bar_chart(aging_summary):
+    """Biểu đồ cột ngang tổng dư nợ theo nhóm tuổi nợ, kèm nhãn giá trị."""
+    chart_aging_bar_horizontal = alt.Chart(aging_summary).mark_bar().encode(
+        y=alt.Y('Tuổi Nợ:N', sort=None, title='Nhóm Tuổi Nợ'),
+        x=alt.X('Tổng Số Tiền:Q', title='Tổng Dư Nợ (VNĐ)', axis=alt.Axis(format='~s')),
+        color=alt.Color('Tuổi Nợ:N', legend=None, scale=alt.Scale(scheme='tableau10')),
+        tooltip=[
+            alt.Tooltip('Tuổi Nợ:N', title='Nhóm Tuổi Nợ'),
+            alt.Tooltip('Tổng Số Tiền:Q', title='Tổng Dư Nợ', format=',.0f')
+        ]
+    ).properties(
+        title='Tổng Quan Công Nợ Phải Thu Theo Tuổi Nợ (Ngang)',
+    )
+
+    text_horizontal = chart_aging_bar_horizontal.mark_text(
+        align='left',
+        baseline='middle',
+        dx=5
+    ).encode(
+        text=alt.Text('Tổng Số Tiền:Q', format='~s')
+    )
+    return chart_aging_bar_horizontal + text_horizontal
+
+
+def aging_trend_chart(trend_data):
+    """Biểu đồ cột chồng dư nợ theo nhóm tuổi nợ tại từng ngày chốt."""
+    return alt.Chart(trend_data).mark_bar().transform_calculate(
+        bucket_order=f"indexof({AGE_LABELS!r}, datum['Tuổi Nợ'])"
+    ).encode(
+        x=alt.X('yearmonthdate(Ngày chốt):O', title='Ngày chốt', axis=alt.Axis(format='%d/%m/%Y', labelAngle=-45)),
+        y=alt.Y('Tổng Số Tiền:Q', title='Tổng Dư Nợ (VNĐ)', axis=alt.Axis(format='~s')),
+        color=alt.Color('Tuổi Nợ:N', title='Nhóm Tuổi Nợ', scale=alt.Scale(domain=AGE_LABELS, scheme='tableau10')),
+        order=alt.Order('bucket_order:Q'),
+        tooltip=[
+            alt.Tooltip('Ngày chốt:T', title='Ngày chốt', format='%d/%m/%Y'),
+            alt.Tooltip('Tuổi Nợ:N', title='Nhóm Tuổi Nợ'),
+            alt.Tooltip('Tổng Số Tiền:Q', title='Tổng Dư Nợ', format=',.0f')
+        ]
+    ).properties(
+        height=400,
+        title='Xu hướng công nợ phải thu theo tuổi nợ'
+    )
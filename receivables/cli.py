@@ -0,0 +1,86 @@
+"""
+Dòng lệnh tạo báo cáo tuổi nợ cho cả một thư mục workbook, không cần Streamlit.
+
+    python -m receivables THU_MUC [-o THU_MUC_KET_QUA] [--as-of 2026-09-30] [--sheet TEN] [--streaming]
+
+Với mỗi workbook ghi ra <tên>_aging.csv (bảng tuổi nợ kèm dòng TỔNG CỘNG) và
+<tên>_summary.json (KPI, top 5 khách hàng, tổng hợp theo nhóm tuổi nợ).
+"""
+import argparse
+import json
+import os
+import sys
+
+EXCEL_SUFFIXES = ('.xls', '.xlsx', '.xlsm')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m receivables', description="Tạo báo cáo tuổi nợ cho các file Excel trong một thư mục.")
+    parser.add_argument('input_dir', help="Thư mục chứa các file .xls/.xlsx")
+    parser.add_argument('-o', '--output-dir', default='reports', help="Thư mục ghi báo cáo (mặc định: reports)")
+    parser.add_argument('--as-of', default=None, help="Ngày chốt tuổi nợ, dạng YYYY-MM-DD (mặc định: hôm nay)")
+    parser.add_argument('--sheet', default=None, help="Tên sheet cần đọc (mặc định: sheet đầu tiên)")
+    parser.add_argument('--streaming', action='store_true', help="Đọc .xlsx theo luồng để tiết kiệm bộ nhớ")
+    return parser
+
+
+def write_report(aging_report, output_dir, stem):
+    """Ghi bảng tuổi nợ (CSV) và phần tóm tắt (JSON); trả về danh sách file đã ghi."""
+    import pandas as pd
+
+    os.makedirs(output_dir, exist_ok=True)
+    pivot_path = os.path.join(output_dir, f"{stem}_aging.csv")
+    summary_path = os.path.join(output_dir, f"{stem}_summary.json")
+
+    pivot = pd.concat([aging_report.pivot, pd.DataFrame([aging_report.total_row])], ignore_index=True)
+    pivot.to_csv(pivot_path, index=False, encoding='utf-8-sig') # BOM để Excel hiển thị đúng tiếng Việt
+
+    summary = {
+        'source': aging_report.source_name,
+        'sheet': aging_report.sheet_name,
+        'as_of': aging_report.as_of.date().isoformat(),
+        'customers': len(aging_report.pivot),
+        'kpis': aging_report.kpis,
+        'top_customers': [
+            {'customer': str(row.customer), 'amount': float(row.amount)}
+            for row in aging_report.top_customers.itertuples(index=False)
+        ],
+        'aging_summary': {
+            str(row[0]): float(row[1]) for row in aging_report.aging_summary.itertuples(index=False)
+        },
+    }
+    with open(summary_path, 'w', encoding='utf-8') as summary_file:
+        json.dump(summary, summary_file, ensure_ascii=False, indent=2)
+    return [pivot_path, summary_path]
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.input_dir):
+        print(f"Không tìm thấy thư mục: {args.input_dir}", file=sys.stderr)
+        return 2
+
+    # Import muộn: pandas/openpyxl chỉ được nạp khi thực sự cần xử lý file
+    from . import engine
+
+    workbook_names = sorted(
+        name for name in os.listdir(args.input_dir)
+        if name.lower().endswith(EXCEL_SUFFIXES) and not name.startswith('~$') # Bỏ file khóa của Excel
+    )
+    if not workbook_names:
+        print(f"Không có file Excel nào trong {args.input_dir}", file=sys.stderr)
+        return 1
+
+    failures = 0
+    for name in workbook_names:
+        path = os.path.join(args.input_dir, name)
+        try:
+            aging_report = engine.run_report(path, sheet_name=args.sheet, as_of=args.as_of, streaming=args.streaming)
+            written = write_report(aging_report, args.output_dir, os.path.splitext(name)[0])
+        except Exception as e: # Một file lỗi không làm dừng cả thư mục
+            failures += 1
+            print(f"{name}: LỖI - {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        print(f"{name} [{aging_report.sheet_name}]: {len(aging_report.pivot):,} khách hàng -> {', '.join(written)}")
+
+    return 1 if failures else 0
@@ -0,0 +1,52 @@
+"""
+Xem chi tiết hóa đơn của một khách hàng mà không phải quét lại toàn bộ sổ công nợ.
+
+Chỉ mục được dựng một lần cho mỗi bộ dữ liệu: vị trí các dòng được sắp theo khách hàng rồi
+theo ngày đến hạn tăng dần (tức quá hạn lâu nhất trước), cùng khoảng [start, stop) của từng
+khách hàng. Thứ tự này không phụ thuộc ngày chốt, nên đổi ngày chốt không phải dựng lại chỉ
+mục; tra một khách hàng là một lần tra dict và một lát cắt mảng.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .aging import age_frame
+
+
+@dataclass
+class CustomerIndex:
+    order: np.ndarray # Vị trí (iloc) các dòng, nhóm theo khách hàng, ngày đến hạn tăng dần
+    spans: dict       # {tên khách hàng dạng str: (start, stop)} trong order
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + len(self.spans) * 200 # Ước lượng cho dict
+
+    def positions(self, customer):
+        # Tra theo str vì khách hàng chọn từ grid/biểu đồ đi qua JSON của trình duyệt
+        start, stop = self.spans.get(str(customer), (0, 0))
+        return self.order[start:stop]
+
+
+def build_customer_index(df):
+    """Dựng chỉ mục khách hàng → các dòng hóa đơn cho frame đã chuẩn hóa."""
+    codes, customers = pd.factorize(df['customer'])
+    if not len(codes):
+        return CustomerIndex(np.empty(0, dtype='int64'), {})
+    due = df['due_date'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((due, codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    stops = np.r_[starts[1:], len(order)]
+    group_codes = sorted_codes[starts]
+    valid = group_codes >= 0 # factorize trả -1 cho khách hàng thiếu
+    names = np.asarray(customers, dtype=object)[group_codes[valid]]
+    spans = dict(zip(map(str, names), zip(starts[valid].tolist(), stops[valid].tolist())))
+    return CustomerIndex(order, spans)
+
+
+def customer_invoices(df, index, customer, as_of=None):
+    """Các hóa đơn của customer kèm số ngày quá hạn và nhóm tuổi nợ, quá hạn lâu nhất trước."""
+    invoices = df.iloc[index.positions(customer)]
+    return age_frame(invoices, as_of).reset_index(drop=True)
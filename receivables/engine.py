@@ -0,0 +1,95 @@
+"""
+Engine báo cáo tuổi nợ độc lập với Streamlit: load → normalize → age → pivot → KPI.
+
+Các bảng dẫn xuất được tính qua đồ thị artifact của pipeline (REPORT_GRAPH), cùng khóa và
+cache với dashboard. Module này chỉ phụ thuộc pandas/numpy (và openpyxl khi đọc Excel);
+không import streamlit, altair hay st_aggrid, nên dùng được từ job chạy nền và từ CLI.
+"""
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from . import aging, grid_data, ingest, mappings, pipeline, report
+from .profiling import NULL_PROFILER
+
+
+@dataclass
+class AgingReport:
+    source_name: str
+    sheet_name: str
+    as_of: pd.Timestamp
+    kpis: dict
+    pivot: pd.DataFrame           # 'Khách hàng', các nhóm tuổi nợ, 'Dư nợ' (không có cột tooltip)
+    total_row: dict               # Dòng TỔNG CỘNG
+    top_customers: pd.DataFrame   # Top 5 khách hàng + 'Khách Hàng Khác'
+    aging_summary: pd.DataFrame   # 'Tuổi Nợ', 'Tổng Số Tiền'
+
+
+def load_ledger(source, sheet_name=None, streaming=False, digest=None, profiler=NULL_PROFILER):
+    """
+    Đọc và chuẩn hóa một sheet từ đường dẫn file hoặc bytes (digest: mã băm đã tính của bytes).
+    sheet_name=None lấy sheet đầu tiên. Trả về (sheet_name, NormalizedSheet, digest);
+    sheet.mapping là cấu hình cột đã lưu cho mẫu file này (nếu có).
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, 'rb') as workbook_file:
+            data = workbook_file.read()
+    digest = digest or ingest.content_digest(data)
+    if sheet_name is None:
+        sheet_name = ingest.list_sheets(data, digest)[0]
+    mapping = mappings.find_mapping(data, sheet_name, digest)
+    sheet = ingest.load_sheet(data, sheet_name, digest, streaming=streaming, profiler=profiler, mapping=mapping)
+    return sheet_name, sheet, digest
+
+
+def ledger_key(digest, sheet_name, sheet):
+    """Khóa của frame đã chuẩn hóa; gồm cả cột nguồn vì cùng file có thể đọc với cấu hình cột khác."""
+    return (digest, sheet_name, sheet.columns_key)
+
+
+normalize_ledger = ingest.normalize_frame
+
+
+def age_ledger(frame, as_of=None):
+    """Thêm days_overdue và age_category tính đến ngày chốt as_of (mặc định hôm nay)."""
+    return aging.age_frame(frame, aging.as_of_timestamp(as_of))
+
+
+def report_artifacts(frame, key, as_of=None, graph=pipeline.REPORT_GRAPH, profiler=NULL_PROFILER):
+    """
+    Các bảng dẫn xuất của frame công nợ tại ngày chốt as_of, tính lười và cache theo key
+    (vd. ledger_key). Dashboard truyền pipeline.DASHBOARD_GRAPH để có thêm các bảng giao diện.
+    """
+    return graph.run(profiler=profiler, normalized=pipeline.Input(key, frame), as_of=aging.as_of_timestamp(as_of))
+
+
+def aging_pivot(artifacts, tooltips=False):
+    """Bảng tuổi nợ theo khách hàng; tooltips=True lấy bảng của dashboard kèm các cột *_tooltip."""
+    if tooltips:
+        return artifacts['report']
+    return artifacts['pivot'].reset_index()
+
+
+compute_kpis = report.compute_kpis
+
+
+def run_report(source, sheet_name=None, as_of=None, streaming=False):
+    """Chạy toàn bộ chuỗi xử lý cho một workbook và trả về AgingReport."""
+    sheet_name, sheet, digest = load_ledger(source, sheet_name, streaming)
+    as_of = aging.as_of_timestamp(as_of)
+    artifacts = report_artifacts(sheet.frame, ledger_key(digest, sheet_name, sheet), as_of)
+    pivot = aging_pivot(artifacts)
+    source_name = os.path.basename(source) if isinstance(source, (str, os.PathLike)) else '<bytes>'
+    return AgingReport(
+        source_name=source_name,
+        sheet_name=str(sheet_name),
+        as_of=as_of,
+        kpis=artifacts['kpis'],
+        pivot=pivot,
+        total_row=grid_data.total_row(pivot),
+        top_customers=artifacts['top_customers'],
+        aging_summary=artifacts['chart_frames'].aging_summary,
+    )
@@ -0,0 +1,123 @@
+"""
+Xuất báo cáo tuổi nợ ra file: bảng tuổi nợ (kèm dòng TỔNG CỘNG), dư nợ theo khách hàng ×
+loại hình dịch vụ và chi tiết từng hóa đơn kèm nhóm tuổi nợ.
+
+Các bảng được dựng từ báo cáo và dữ liệu biểu đồ đã cache, không tính lại pivot. Excel được
+ghi theo luồng bằng xlsx.XlsxWriter (bộ nhớ không đổi theo số dòng); CSV và Parquet
+(nén trong một file .zip) là đường nhanh cho sổ lớn.
+"""
+import io
+import zipfile
+
+import pandas as pd
+
+from .grid_data import TOTAL_LABEL, total_row
+from .report import CUSTOMER_COLUMN, TOOLTIP_SUFFIX, TOTAL_COLUMN
+from .xlsx import XlsxWriter
+
+# (tên file trong .zip, tên sheet Excel)
+TABLES = {
+    'aging': 'Tuổi nợ',
+    'customer_service': 'Theo dịch vụ',
+    'invoices': 'Chi tiết hóa đơn',
+}
+TOTAL_ROW_TABLES = ('aging', 'customer_service') # Bảng có dòng TỔNG CỘNG ở cuối, được in đậm
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": "xlsx",
+    "CSV (.zip)": "csv",
+    "Parquet (.zip)": "parquet",
+}
+EXPORT_MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "application/zip",
+    "parquet": "application/zip",
+}
+EXCEL_MAX_ROWS = 1_048_576 # Giới hạn số dòng một sheet Excel (kể cả dòng tiêu đề)
+INVOICE_COLUMNS = {
+    'customer': CUSTOMER_COLUMN,
+    'due_date': 'Ngày đến hạn',
+    'amount': 'Số tiền',
+    'service_type': 'Loại hình dịch vụ',
+    'days_overdue': 'Số ngày quá hạn',
+    'age_category': 'Tuổi nợ',
+    'source': 'Nguồn',
+}
+
+
+def aging_table(report_df):
+    """Bảng tuổi nợ theo khách hàng (bỏ các cột tooltip) với dòng TỔNG CỘNG ở cuối."""
+    columns = [col for col in report_df.columns if not col.endswith(TOOLTIP_SUFFIX)]
+    return pd.concat([report_df[columns], pd.DataFrame([total_row(report_df)])], ignore_index=True)
+
+
+def customer_service_table(customer_service):
+    """Dư nợ khách hàng × loại hình dịch vụ (mỗi dịch vụ một cột), giảm dần theo tổng, kèm dòng TỔNG CỘNG."""
+    table = customer_service.pivot_table(
+        index='customer', columns='service_type', values='amount', aggfunc='sum', fill_value=0, observed=True
+    )
+    table.columns = [str(col) for col in table.columns]
+    table[TOTAL_COLUMN] = table.sum(axis=1)
+    table = table.sort_values(TOTAL_COLUMN, ascending=False)
+    table.loc[TOTAL_LABEL] = table.sum()
+    return table.rename_axis(CUSTOMER_COLUMN).reset_index()
+
+
+def invoice_table(aged_df):
+    """Chi tiết từng hóa đơn kèm số ngày quá hạn và nhóm tuổi nợ, tên cột tiếng Việt."""
+    columns = [col for col in INVOICE_COLUMNS if col in aged_df.columns]
+    return aged_df[columns].rename(columns=INVOICE_COLUMNS)
+
+
+def export_tables(report_df, customer_service, aged_df=None):
+    """{tên bảng: DataFrame} theo thứ tự TABLES; aged_df=None thì bỏ bảng chi tiết hóa đơn."""
+    tables = {
+        'aging': aging_table(report_df),
+        'customer_service': customer_service_table(customer_service),
+    }
+    if aged_df is not None:
+        tables['invoices'] = invoice_table(aged_df)
+    return tables
+
+
+def write_xlsx(tables, target):
+    """Ghi mỗi bảng ra một sheet; bảng vượt giới hạn dòng của Excel được chia sang các sheet tiếp theo."""
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+    with XlsxWriter(target) as writer:
+        for name, df in tables.items():
+            n_sheets = max(1, -(-len(df) // rows_per_sheet))
+            for part in range(n_sheets):
+                title = TABLES[name] if part == 0 else f"{TABLES[name]} ({part + 1})"
+                is_last = part == n_sheets - 1
+                writer.write_sheet(
+                    title, df.iloc[part * rows_per_sheet:(part + 1) * rows_per_sheet],
+                    bold_last_row=is_last and name in TOTAL_ROW_TABLES,
+                )
+
+
+def write_zip(tables, target, fmt):
+    """Mỗi bảng thành một file .csv (UTF-8 có BOM để Excel đọc đúng tiếng Việt) hoặc .parquet trong file .zip."""
+    compression = zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED # Parquet đã nén sẵn
+    with zipfile.ZipFile(target, 'w', compression=compression) as archive:
+        for name, df in tables.items():
+            with archive.open(f"{name}.{fmt}", 'w', force_zip64=True) as member:
+                if fmt == 'csv':
+                    with io.TextIOWrapper(member, encoding='utf-8-sig', newline='') as text:
+                        df.to_csv(text, index=False)
+                else:
+                    df.to_parquet(member, index=False)
+
+
+def export_bytes(tables, fmt):
+    """Nội dung file xuất theo định dạng fmt ('xlsx', 'csv' hoặc 'parquet')."""
+    buffer = io.BytesIO()
+    if fmt == 'xlsx':
+        write_xlsx(tables, buffer)
+    elif fmt in ('csv', 'parquet'):
+        write_zip(tables, buffer, fmt)
+    else:
+        raise ValueError(f"Định dạng xuất không hỗ trợ: {fmt}")
+    return buffer.getvalue()
+
+
+def export_file_name(stem, fmt):
+    return f"{stem}.{'xlsx' if fmt == 'xlsx' else 'zip'}"
@@ -0,0 +1,56 @@
+"""
+Lọc, sắp xếp và phân trang bảng báo cáo tuổi nợ phía server.
+
+Ở chế độ phân trang phía server, AgGrid chỉ nhận các dòng của trang đang xem (kèm
+tooltip của đúng những dòng đó) cùng dòng tổng cộng được ghim, thay vì toàn bộ bảng.
+"""
+import math
+
+import numpy as np
+
+from .report import AMOUNT_COLUMNS, CUSTOMER_COLUMN, TOTAL_COLUMN
+
+TOTAL_LABEL = 'TỔNG CỘNG'
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+SERVER_SIDE_THRESHOLD = 2000 # Số khách hàng từ đó mặc định bật phân trang phía server
+
+
+def query_positions(report_df, search=None, sort_by=TOTAL_COLUMN, ascending=False):
+    """
+    Vị trí (iloc) các dòng của report_df sau khi lọc theo tên khách hàng và sắp xếp.
+    Chỉ trả về mảng vị trí (được cache như artifact 'grid_positions'), bảng báo cáo gốc không bị sao chép.
+    """
+    search = (search or '').strip()
+    positions = np.arange(len(report_df))
+    if search:
+        mask = report_df[CUSTOMER_COLUMN].astype(str).str.contains(search, case=False, regex=False)
+        positions = np.flatnonzero(mask.to_numpy())
+    if sort_by == CUSTOMER_COLUMN:
+        sort_values = report_df[CUSTOMER_COLUMN].astype(str).str.lower().to_numpy(dtype=object)[positions]
+    else:
+        sort_values = report_df[sort_by].to_numpy()[positions]
+    positions = positions[np.argsort(sort_values, kind='stable')]
+    if not ascending:
+        positions = positions[::-1]
+    return positions
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_slice(report_df, positions, page, page_size):
+    """Các dòng của trang `page` (bắt đầu từ 1)."""
+    start = (page - 1) * page_size
+    return report_df.iloc[positions[start:start + page_size]]
+
+
+def total_row(report_df, positions=None):
+    """Dòng TỔNG CỘNG được ghim ở cuối grid, tính trên các dòng đang được lọc (positions)."""
+    rows = report_df if positions is None else report_df.iloc[positions]
+    total_row_data = {CUSTOMER_COLUMN: TOTAL_LABEL}
+    total_sum_values = rows[AMOUNT_COLUMNS].sum()
+    for col_name_sum in AMOUNT_COLUMNS:
+        value = total_sum_values[col_name_sum]
+        total_row_data[col_name_sum] = int(value) if not np.isnan(value) else 0
+    return total_row_data
@@ -0,0 +1,64 @@
+"""Cấu hình AgGrid cho bảng báo cáo tuổi nợ (định dạng số, tooltip, dòng tổng cộng được ghim)."""
+from st_aggrid import GridOptionsBuilder, JsCode
+
+from .report import AMOUNT_COLUMNS, CUSTOMER_COLUMN, TOOLTIP_SUFFIX, tooltip_column
+
+NUMBER_FORMATTER = JsCode("""
+    function formatNumberWithPoint(params) {
+        if (params.value == null || isNaN(params.value)) {
+            return "";
+        }
+        return Number(params.value).toLocaleString('vi-VN', {
+            minimumFractionDigits: 0,
+            maximumFractionDigits: 0
+        });
+    }""")
+
+PINNED_ROW_STYLE = JsCode("""
+    function(params) {
+        if (params.node.isRowPinned && params.node.rowPinned === 'bottom') {
+            return { 'font-weight': 'bold' };
+        }
+    }
+""")
+
+
+def build_grid_options(grid_frame, total_row_data, server_side=False, page_size=10):
+    """
+    gridOptions cho grid_frame. Ở chế độ server_side, grid_frame chỉ là một trang nên
+    phân trang, sắp xếp và lọc phía client được tắt.
+    """
+    gb = GridOptionsBuilder.from_dataframe(grid_frame)
+    if server_side:
+        gb.configure_default_column(filterable=False, sortable=False, resizable=True, aggFunc='sum')
+    else:
+        gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=page_size)
+        gb.configure_default_column(filterable=True, sortable=True, resizable=True, aggFunc='sum')
+
+    gb.configure_selection('single') # Chọn một khách hàng để xem chi tiết hóa đơn
+
+    gb.configure_column(CUSTOMER_COLUMN, headerName=CUSTOMER_COLUMN, width=250, pinned='left',
+                        cellStyle={'textAlign': 'left'})
+
+    for col_name in AMOUNT_COLUMNS:
+        column_params = {
+            "headerName": col_name.replace("_", " ").title(),
+            "type": ["numericColumn", "numberColumnFilter"],
+            "valueFormatter": NUMBER_FORMATTER,
+            "aggFunc": 'sum',
+            "cellStyle": {'textAlign': 'right'}
+        }
+        if tooltip_column(col_name) in grid_frame.columns:
+            column_params["tooltipField"] = tooltip_column(col_name)
+        gb.configure_column(col_name, **column_params)
+
+    # Các cột *_tooltip chỉ để tooltipField tham chiếu, không hiển thị trên grid
+    for col_in_df in grid_frame.columns:
+        if col_in_df.endswith(TOOLTIP_SUFFIX):
+            gb.configure_column(col_in_df, hide=True)
+
+    grid_options = gb.build()
+    grid_options['enableBrowserTooltips'] = True
+    grid_options['pinnedBottomRowData'] = [total_row_data]
+    grid_options['getRowStyle'] = PINNED_ROW_STYLE
+    return grid_options
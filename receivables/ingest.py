@@ -0,0 +1,471 @@
+"""
+Nạp dữ liệu công nợ từ file Excel.
+
+Workbook chỉ được parse một lần cho mỗi (nội dung file, sheet). Frame đã chuẩn hóa
+được giữ trong một cache LRU giới hạn theo dung lượng, dùng chung cho mọi session
+trên cùng server, nên các lần rerun của Streamlit không phải đọc lại Excel.
+"""
+import hashlib
+import io
+import re
+import unicodedata
+import zipfile
+from dataclasses import dataclass, field
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+from .cache import frame_nbytes, shared_cache
+from .memory import PeakTracker
+from .profiling import NULL_PROFILER
+
+REQUIRED_COLUMNS = {
+    "customer": "KhachHang",      # Tên khách hàng
+    "due_date": "NgayDaoHan",     # Ngày đến hạn (phải là định dạng ngày)
+    "amount": "SoTienPhaiThu",  # Số tiền còn phải thu
+    "service_type": "LoaiHinhDichVu" # Loại hình dịch vụ (R,E,W,P,F)
+}
+
+COMMON_ALTERNATIVES = {
+    "KhachHang": ["khach hang", "ten khach hang", "customer name", "customer","CTY"],
+    "NgayDaoHan": ["ngay dao han", "due date","HẠN TT"],
+    "SoTienPhaiThu": ["so tien phai thu", "amount due", "outstanding amount", "balance","DƯ NỢ"],
+    "LoaiHinhDichVu": ["loai hinh dich vu", "service type", "product type","Loại hình"]
+}
+
+MANDATORY_KEYS = ("customer", "due_date", "amount")
+UNKNOWN_SERVICE = 'Không xác định'
+STREAM_CHUNK_ROWS = 50_000
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024 # File lớn hơn mức này mặc định đọc theo luồng
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class MissingColumnsError(Exception):
+    """Sheet không có đủ các cột bắt buộc."""
+
+    def __init__(self, missing, available):
+        super().__init__(f"Thiếu các cột bắt buộc: {', '.join(missing)}")
+        self.missing = list(missing)
+        self.available = [str(col) for col in available]
+
+
+@dataclass
+class NormalizedSheet:
+    """Frame công nợ đã chuẩn hóa cùng các ghi chú về cột được nhận diện."""
+    frame: pd.DataFrame
+    column_notes: list = field(default_factory=list) # [(cột trong file, tên mặc định)]
+    has_service_type: bool = True
+    nbytes: int = 0
+    streamed: bool = False # Đọc bằng read_sheet_streaming
+    rows_read: int = 0     # Số dòng dữ liệu đã đọc (chỉ khi streamed)
+    peak_bytes: int = 0    # Mức tăng RSS đỉnh khi đọc (chỉ khi streamed)
+    columns: dict = field(default_factory=dict)       # {khóa trong REQUIRED_COLUMNS: cột trong file}
+    source_dtypes: dict = field(default_factory=dict) # {khóa: kiểu pandas của cột khi đọc, trước khi chuyển kiểu}
+    mapping_name: str = None # Tên cấu hình cột đã lưu được dùng thay cho bước nhận diện
+    mapping: object = None   # Cấu hình cột đã lưu khớp với file (kể cả khi không đọc được theo nó)
+
+    @property
+    def columns_key(self):
+        """Cột nguồn của từng khóa, dạng dùng được trong khóa cache (cùng file có thể đọc với cấu hình cột khác)."""
+        return tuple(sorted((key, str(col)) for key, col in self.columns.items()))
+
+
+def content_digest(data):
+    """Mã băm nội dung file, dùng làm khóa cache."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def list_sheets(data, digest=None):
+    """Danh sách sheet của workbook (có cache theo nội dung file)."""
+    digest = digest or content_digest(data)
+    key = ("sheets", digest)
+    sheet_names = shared_cache.get(key)
+    if sheet_names is None:
+        sheet_names = list(pd.ExcelFile(io.BytesIO(data)).sheet_names)
+        shared_cache.put(key, sheet_names, sum(len(str(name)) for name in sheet_names) + 64)
+    return sheet_names
+
+
+def normalize_header(name):
+    """
+    Dạng so khớp của tiêu đề cột: Unicode NFC, bỏ dấu tiếng Việt (đ → d), không phân biệt
+    hoa thường, bỏ khoảng trắng và dấu câu. "DƯ NỢ ", "Dư nợ" và "du_no" cho cùng một khóa.
+    """
+    text = unicodedata.normalize('NFC', str(name)).replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text) if not unicodedata.combining(ch))
+    return re.sub(r'[\W_]+', '', text.casefold())
+
+
+def _build_header_index():
+    """{tiêu đề đã chuẩn hóa: (khóa, thứ hạng)}; hạng 0 là tên mặc định, sau đó theo thứ tự COMMON_ALTERNATIVES."""
+    index = {}
+    for key, default_name in REQUIRED_COLUMNS.items():
+        for rank, name in enumerate([default_name] + COMMON_ALTERNATIVES.get(default_name, [])):
+            index.setdefault(normalize_header(name), (key, rank))
+    return index
+
+
+HEADER_INDEX = _build_header_index()
+
+
+def column_notes_for(actual_columns):
+    """[(cột trong file, tên mặc định)] cho các khóa không dùng đúng tên mặc định."""
+    return [
+        (col, REQUIRED_COLUMNS[key]) for key, col in actual_columns.items() if str(col) != REQUIRED_COLUMNS[key]
+    ]
+
+
+def resolve_columns(columns):
+    """
+    Ánh xạ các khóa trong REQUIRED_COLUMNS sang tên cột thực tế của file.
+    Trả về (actual_columns, column_notes, missing_cols).
+
+    Mỗi tiêu đề được tra một lần trong HEADER_INDEX; khi nhiều cột cùng khớp một khóa, cột
+    khớp tên có thứ hạng cao hơn (rồi cột đứng trước) được chọn.
+    """
+    matches = {} # {khóa: (thứ hạng, cột)}
+    for col in columns:
+        match = HEADER_INDEX.get(normalize_header(col))
+        if match is None:
+            continue
+        key, rank = match
+        if key not in matches or rank < matches[key][0]:
+            matches[key] = (rank, col)
+    actual_columns = {key: matches[key][1] for key in REQUIRED_COLUMNS if key in matches}
+    missing_cols = [
+        default_name for key, default_name in REQUIRED_COLUMNS.items() if key in MANDATORY_KEYS and key not in matches
+    ]
+    return actual_columns, column_notes_for(actual_columns), missing_cols
+
+
+def _xlsx_sheet_path(archive, sheet_name):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    rel_id = next(
+        (sheet.get(f'{_REL_NS}id') for sheet in workbook.iter(f'{_SHEET_NS}sheet') if sheet.get('name') == str(sheet_name)),
+        None,
+    )
+    if rel_id is None:
+        raise KeyError(f"Không tìm thấy sheet '{sheet_name}'")
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    target = next(rel.get('Target') for rel in rels if rel.get('Id') == rel_id)
+    return target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+
+
+def _shared_strings(archive, count):
+    """count chuỗi đầu tiên của sharedStrings.xml (chỉ parse đến chuỗi cần dùng)."""
+    strings = []
+    if count <= 0 or 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    with archive.open('xl/sharedStrings.xml') as source:
+        for _, elem in ElementTree.iterparse(source):
+            if elem.tag == f'{_SHEET_NS}si':
+                strings.append(''.join(text.text or '' for text in elem.iter(f'{_SHEET_NS}t')))
+                if len(strings) >= count:
+                    break
+                elem.clear()
+    return strings
+
+
+def _column_position(cell_ref):
+    position = 0
+    for ch in re.match(r'[A-Z]+', cell_ref).group():
+        position = position * 26 + ord(ch) - ord('A') + 1
+    return position - 1
+
+
+def _xlsx_header(data, sheet_name):
+    """Dòng tiêu đề của sheet .xlsx, chỉ parse XML đến hết dòng đầu tiên có giá trị."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        cells = [] # [(vị trí cột, kiểu ô, giá trị thô)]
+        with archive.open(_xlsx_sheet_path(archive, sheet_name)) as source:
+            for _, elem in ElementTree.iterparse(source):
+                if elem.tag == f'{_SHEET_NS}c':
+                    if elem.get('t') == 'inlineStr':
+                        value = ''.join(text.text or '' for text in elem.iter(f'{_SHEET_NS}t'))
+                    else:
+                        value = elem.findtext(f'{_SHEET_NS}v')
+                    if value is not None:
+                        ref = elem.get('r')
+                        cells.append((_column_position(ref) if ref else len(cells), elem.get('t'), value))
+                elif elem.tag == f'{_SHEET_NS}row':
+                    if cells:
+                        break
+                    elem.clear()
+        shared = _shared_strings(archive, 1 + max((int(v) for _, t, v in cells if t == 's'), default=-1))
+    header = [''] * (max((pos for pos, _, _ in cells), default=-1) + 1)
+    for pos, cell_type, value in cells:
+        header[pos] = shared[int(value)] if cell_type == 's' else value
+    return header
+
+
+def read_header(data, sheet_name, digest=None):
+    """
+    Các tiêu đề (dạng chuỗi, '' cho ô trống) của dòng đầu tiên trong sheet, theo vị trí cột.
+    Với .xlsx chỉ đọc phần đầu XML của sheet, không mở cả workbook (có cache theo nội dung file).
+    """
+    digest = digest or content_digest(data)
+    key = ("header", digest, sheet_name)
+    header = shared_cache.get(key)
+    if header is None:
+        if is_xlsx(data):
+            header = _xlsx_header(data, sheet_name)
+        else:
+            columns = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, nrows=0).columns
+            header = ['' if str(col).startswith('Unnamed: ') else str(col) for col in columns]
+        shared_cache.put(key, header, sum(len(col) for col in header) + 64)
+    return header
+
+
+def coerce_types(df):
+    """
+    Chuyển kiểu ngày/số tiền, điền loại hình dịch vụ thiếu (sửa trực tiếp df).
+    Cột đã đúng kiểu (vd. đọc với dtype từ cấu hình cột) không phải chuyển lại.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df['due_date']):
+        df['due_date'] = pd.to_datetime(df['due_date'], errors='coerce')
+    if not pd.api.types.is_float_dtype(df['amount']):
+        # float64 như khi đọc theo luồng hoặc theo cấu hình cột, để mọi cách đọc cho cùng một frame
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64')
+    df['amount'] = df['amount'].fillna(0)
+
+    if 'service_type' in df.columns:
+        df['service_type'] = df['service_type'].fillna(UNKNOWN_SERVICE).astype(str)
+    else:
+        df['service_type'] = UNKNOWN_SERVICE
+    return df
+
+
+def drop_invalid(df):
+    """Loại bỏ dòng thiếu ngày/khách hàng hoặc số tiền không dương."""
+    df = df.dropna(subset=['due_date', 'customer'])
+    df = df[df['amount'] > 0].reset_index(drop=True)
+    return df[['customer', 'due_date', 'amount', 'service_type']]
+
+
+def clean_frame(df):
+    """
+    Chuyển kiểu ngày/số tiền và loại bỏ dòng không hợp lệ trên frame đã đổi tên cột
+    (customer, due_date, amount và có thể có service_type).
+    """
+    return drop_invalid(coerce_types(df))
+
+
+def normalize_frame(df_raw, profiler=NULL_PROFILER, columns=None):
+    """
+    Đổi tên cột, chuyển kiểu ngày/số tiền và loại bỏ dòng không hợp lệ.
+    columns = {khóa: cột trong file} đã biết (từ cấu hình cột) thì bỏ qua bước nhận diện.
+    """
+    with profiler.stage('rename') as timing:
+        if columns is None:
+            actual_columns, column_notes, missing_cols = resolve_columns(df_raw.columns)
+            if missing_cols:
+                raise MissingColumnsError(missing_cols, df_raw.columns)
+        else:
+            actual_columns, column_notes = dict(columns), column_notes_for(columns)
+        df = df_raw[list(actual_columns.values())].rename(columns={v: k for k, v in actual_columns.items()})
+        source_dtypes = {key: str(dtype) for key, dtype in df.dtypes.items()}
+        timing.rows = len(df)
+    with profiler.stage('coercion', rows=len(df)):
+        df = coerce_types(df)
+    with profiler.stage('filtering') as timing:
+        df = drop_invalid(df)
+        timing.rows = len(df)
+    return NormalizedSheet(
+        df, column_notes, 'service_type' in actual_columns, frame_nbytes(df),
+        columns=actual_columns, source_dtypes=source_dtypes,
+    )
+
+
+def read_mapped_columns(data, sheet_name, mapping):
+    """
+    Đọc chỉ các cột của cấu hình cột (theo vị trí trong dòng tiêu đề) với kiểu đã lưu.
+    Trả về frame có tên cột là các khóa trong mapping.columns.
+    """
+    positions = {mapping.header.index(col): key for key, col in mapping.columns.items()}
+    usecols = sorted(positions)
+    # Khi có usecols, khóa số của dtype là vị trí trong các cột được chọn, không phải trong cả sheet
+    dtypes = {
+        i: mapping.dtypes[positions[pos]] for i, pos in enumerate(usecols) if positions[pos] in mapping.dtypes
+    }
+    try:
+        df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, usecols=usecols, dtype=dtypes or None)
+    except ValueError: # Có ô không còn khớp kiểu đã lưu: đọc lại, để coerce_types tự chuyển kiểu
+        df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, usecols=usecols)
+    df.columns = [positions[pos] for pos in usecols]
+    return df
+
+
+def is_xlsx(data):
+    """File .xlsx/.xlsm là gói zip; file .xls cũ không đọc được bằng openpyxl."""
+    return data[:4] == b'PK\x03\x04'
+
+
+class _CategoryEncoder:
+    """Gán mã int32 toàn cục cho các giá trị xuất hiện qua nhiều chunk."""
+
+    def __init__(self):
+        self._code_of = {}
+        self.categories = []
+
+    def encode(self, values):
+        chunk_codes, uniques = pd.factorize(values)
+        global_codes = np.empty(len(uniques), dtype='int32')
+        for i, value in enumerate(uniques):
+            code = self._code_of.get(value)
+            if code is None:
+                code = self._code_of[value] = len(self.categories)
+                self.categories.append(value)
+            global_codes[i] = code
+        return global_codes[chunk_codes]
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.categories, dtype=object))
+
+
+def read_sheet_streaming(data, sheet_name, chunk_rows=STREAM_CHUNK_ROWS, track_memory=True, mapping=None):
+    """
+    Đọc sheet .xlsx theo từng dòng bằng chế độ read-only của openpyxl.
+
+    Chỉ các cột cần thiết được giữ lại; mỗi chunk được chuyển kiểu, lọc rồi ghép vào các
+    mảng kiểu gọn (customer/service_type dạng category, amount float64), nên không bao giờ
+    giữ toàn bộ sheet thô trong bộ nhớ. Mức tăng RSS đỉnh (lấy mẫu sau mỗi chunk) được ghi vào kết quả.
+    Có mapping (cấu hình cột đã lưu) thì lấy cột theo vị trí đã lưu, không nhận diện lại.
+    """
+    from openpyxl import load_workbook
+
+    memory = PeakTracker() if track_memory else None
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header_row = next(rows, None) or ()
+        header = [value if value is not None else f"Unnamed: {i}" for i, value in enumerate(header_row)]
+        if mapping is None:
+            actual_columns, column_notes, missing_cols = resolve_columns(header)
+            if missing_cols:
+                raise MissingColumnsError(missing_cols, header)
+            positions = [header.index(col) for col in actual_columns.values()]
+        else:
+            actual_columns, column_notes = dict(mapping.columns), column_notes_for(mapping.columns)
+            positions = [mapping.header.index(col) for col in actual_columns.values()]
+
+        keys = list(actual_columns)
+        customers = _CategoryEncoder()
+        services = _CategoryEncoder()
+        parts = {'customer': [], 'due_date': [], 'amount': [], 'service_type': []}
+        rows_read = 0
+
+        def flush(buffer):
+            chunk = clean_frame(pd.DataFrame(buffer, columns=keys))
+            parts['customer'].append(customers.encode(chunk['customer']))
+            parts['service_type'].append(services.encode(chunk['service_type']))
+            parts['due_date'].append(chunk['due_date'].to_numpy(dtype='datetime64[ns]'))
+            parts['amount'].append(chunk['amount'].to_numpy(dtype='float64'))
+            if memory is not None:
+                memory.sample()
+
+        buffer = []
+        for row in rows:
+            buffer.append(tuple(row[i] if i < len(row) else None for i in positions))
+            if len(buffer) >= chunk_rows:
+                rows_read += len(buffer)
+                flush(buffer)
+                buffer = []
+        if buffer or not rows_read:
+            rows_read += len(buffer)
+            flush(buffer)
+    finally:
+        workbook.close()
+
+    df = pd.DataFrame({
+        'customer': customers.categorical(np.concatenate(parts['customer'])),
+        'due_date': np.concatenate(parts['due_date']),
+        'amount': np.concatenate(parts['amount']),
+        'service_type': services.categorical(np.concatenate(parts['service_type'])),
+    })
+
+    peak_bytes = 0
+    if memory is not None:
+        memory.sample()
+        peak_bytes = memory.peak_bytes
+
+    return NormalizedSheet(
+        df, column_notes, 'service_type' in actual_columns, frame_nbytes(df),
+        streamed=True, rows_read=rows_read, peak_bytes=peak_bytes,
+        columns=actual_columns, mapping_name=mapping.name if mapping is not None else None,
+    )
+
+
+def parse_sheet(data, sheet_name, streaming=False, profiler=NULL_PROFILER, mapping=None):
+    """
+    Đọc và chuẩn hóa một sheet, không qua cache (dùng trong tiến trình con của batch).
+    mapping: cấu hình cột đã lưu khớp với dòng tiêu đề của sheet (xem mappings.find_mapping).
+    """
+    if streaming and is_xlsx(data):
+        # Đổi tên, chuyển kiểu và lọc diễn ra theo từng chunk nên chỉ đo được cả bước
+        with profiler.stage('read', note='streaming: gồm rename/coercion/filtering') as timing:
+            try:
+                sheet = read_sheet_streaming(data, sheet_name, mapping=mapping)
+            except (ValueError, IndexError, KeyError, TypeError):
+                if mapping is None:
+                    raise
+                sheet = read_sheet_streaming(data, sheet_name) # Cấu hình cột hỏng: nhận diện cột như bình thường
+            timing.rows = len(sheet.frame)
+        sheet.mapping = mapping
+        return sheet
+    if mapping is not None:
+        try:
+            with profiler.stage('read', note=f"cấu hình cột '{mapping.name}'") as timing:
+                df = read_mapped_columns(data, sheet_name, mapping)
+                timing.rows = len(df)
+        except (ValueError, IndexError, KeyError, TypeError):
+            pass # Cấu hình cột hỏng hoặc không còn khớp file: nhận diện cột như bình thường
+        else:
+            sheet = normalize_frame(df, profiler, columns={key: key for key in df.columns})
+            sheet.columns, sheet.column_notes = dict(mapping.columns), column_notes_for(mapping.columns)
+            sheet.mapping_name, sheet.mapping = mapping.name, mapping
+            return sheet
+    with profiler.stage('read') as timing:
+        df_raw = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name)
+        timing.rows = len(df_raw)
+    sheet = normalize_frame(df_raw, profiler)
+    sheet.mapping = mapping
+    return sheet
+
+
+def sheet_cache_key(digest, sheet_name, mapping=None, streamed=False):
+    # Cấu hình cột có thể chọn cột khác với bước nhận diện, nên là một phần của khóa; bản đọc
+    # theo luồng (kiểu category, số liệu bộ nhớ đỉnh) được cache riêng với bản đọc bằng pandas
+    key = ("sheet", digest, sheet_name, bool(streamed))
+    return key + ((mapping.cache_token,) if mapping is not None else ())
+
+
+def cached_sheet(digest, sheet_name, mapping=None, streamed=False):
+    return shared_cache.get(sheet_cache_key(digest, sheet_name, mapping, streamed))
+
+
+def cache_sheet(digest, sheet_name, sheet, mapping=None):
+    shared_cache.put(sheet_cache_key(digest, sheet_name, mapping, sheet.streamed), sheet, sheet.nbytes)
+
+
+def load_sheet(data, sheet_name, digest=None, streaming=False, profiler=NULL_PROFILER, mapping=None):
+    """
+    Đọc và chuẩn hóa một sheet, dùng lại kết quả đã cache nếu cùng nội dung file.
+    Frame trả về được dùng chung, người gọi không được sửa trực tiếp (dùng assign/copy).
+    streaming=True dùng read_sheet_streaming (chỉ áp dụng cho .xlsx).
+    """
+    digest = digest or content_digest(data)
+    sheet = cached_sheet(digest, sheet_name, mapping, streamed=streaming and is_xlsx(data))
+    if sheet is None:
+        sheet = parse_sheet(data, sheet_name, streaming, profiler, mapping)
+        cache_sheet(digest, sheet_name, sheet, mapping)
+    else:
+        profiler.record('read', rows=len(sheet.frame), note='cache')
+    return sheet
+
+
+def clear_cache():
+    shared_cache.clear()
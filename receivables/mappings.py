@@ -0,0 +1,127 @@
+"""
+Cấu hình cột đã lưu cho từng mẫu file (layout).
+
+Mẫu file được nhận biết qua dòng tiêu đề của sheet: cùng các tiêu đề theo cùng thứ tự thì
+cùng layout_key. Khi sheet tải lên khớp một cấu hình đã lưu, ingest bỏ qua bước nhận diện
+cột và đoán kiểu: chỉ các cột cần thiết được đọc (usecols), với kiểu đã biết từ lần lưu
+(dtype). Mỗi cấu hình là một file JSON nhỏ trong MAPPING_DIR, đặt tên theo layout_key.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from .ingest import REQUIRED_COLUMNS, content_digest, read_header
+
+MAPPING_DIR = os.environ.get("AR_MAPPING_DIR", "mappings")
+MAPPING_SUFFIX = '.json'
+
+
+@dataclass
+class ColumnMapping:
+    name: str
+    layout: str   # layout_key của dòng tiêu đề
+    header: list  # Dòng tiêu đề (chuỗi) của mẫu file, dùng để lấy vị trí cột
+    columns: dict # {khóa trong REQUIRED_COLUMNS: tiêu đề cột trong file}
+    dtypes: dict = field(default_factory=dict) # {khóa: kiểu khi đọc bằng read_excel}
+    saved_at: str = '' # ISO 8601
+
+    @property
+    def cache_token(self):
+        return (self.layout, tuple(sorted(self.columns.items())), tuple(sorted(self.dtypes.items())))
+
+    @property
+    def label(self):
+        columns = ", ".join(f"{REQUIRED_COLUMNS[key]} ← '{col}'" for key, col in self.columns.items())
+        return f"{self.name} ({columns})"
+
+
+def layout_key(header):
+    return content_digest("\x1f".join(str(col) for col in header).encode('utf-8'))
+
+
+def read_dtypes(source_dtypes):
+    """
+    Kiểu đọc cho các cột mà lần đọc trước đã có đúng kiểu cần dùng; cột khác (vd. ngày
+    nhập dạng chữ) vẫn qua coerce_types như bình thường.
+    """
+    dtypes = {}
+    if source_dtypes.get('amount') in ('float64', 'int64'):
+        dtypes['amount'] = 'float64'
+    for key in ('customer', 'service_type'):
+        if source_dtypes.get(key) in ('str', 'string'):
+            dtypes[key] = 'str'
+    return dtypes
+
+
+def _mapping_path(layout, mapping_dir):
+    return os.path.join(mapping_dir, f"{layout[:16]}{MAPPING_SUFFIX}")
+
+
+def save_mapping(header, columns, dtypes=None, name=None, mapping_dir=None):
+    """Lưu cấu hình cột cho mẫu file có dòng tiêu đề header; ghi đè cấu hình cũ của cùng mẫu."""
+    mapping_dir = mapping_dir or MAPPING_DIR
+    header = [str(col) for col in header]
+    columns = {key: str(col) for key, col in columns.items() if key in REQUIRED_COLUMNS}
+    unknown = [col for col in columns.values() if col not in header]
+    if unknown:
+        raise ValueError(f"Không có cột trong dòng tiêu đề: {', '.join(unknown)}")
+    layout = layout_key(header)
+    mapping = ColumnMapping(
+        name=str(name or layout[:8]),
+        layout=layout,
+        header=header,
+        columns=columns,
+        dtypes={key: dtype for key, dtype in (dtypes or {}).items() if key in columns},
+        saved_at=datetime.now().isoformat(timespec='seconds'),
+    )
+    os.makedirs(mapping_dir, exist_ok=True)
+    path = _mapping_path(layout, mapping_dir)
+    with open(path + '.tmp', 'w', encoding='utf-8') as target:
+        json.dump(asdict(mapping), target, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+    return mapping
+
+
+def _read_mapping(path):
+    try:
+        with open(path, encoding='utf-8') as source:
+            return ColumnMapping(**json.load(source))
+    except (OSError, TypeError, ValueError):
+        return None # File hỏng hoặc không phải cấu hình cột
+
+
+def list_mappings(mapping_dir=None):
+    """Các cấu hình cột đã lưu, mới nhất trước."""
+    mapping_dir = mapping_dir or MAPPING_DIR
+    if not os.path.isdir(mapping_dir):
+        return []
+    mappings = [
+        _read_mapping(os.path.join(mapping_dir, file_name))
+        for file_name in os.listdir(mapping_dir) if file_name.endswith(MAPPING_SUFFIX)
+    ]
+    mappings = [mapping for mapping in mappings if mapping is not None]
+    return sorted(mappings, key=lambda mapping: mapping.saved_at, reverse=True)
+
+
+def find_mapping(data, sheet_name, digest=None, mapping_dir=None):
+    """
+    Cấu hình cột đã lưu khớp với dòng tiêu đề của sheet, hoặc None.
+    Khi chưa lưu cấu hình nào thì không đọc gì từ file; file không đọc được dòng tiêu đề
+    (dù pandas vẫn đọc được) cũng coi như không có cấu hình, để bước parse tự nhận diện cột.
+    """
+    mapping_dir = mapping_dir or MAPPING_DIR
+    if not os.path.isdir(mapping_dir) or not any(name.endswith(MAPPING_SUFFIX) for name in os.listdir(mapping_dir)):
+        return None
+    try:
+        layout = layout_key(read_header(data, sheet_name, digest))
+    except Exception:
+        return None
+    mapping = _read_mapping(_mapping_path(layout, mapping_dir))
+    return mapping if mapping is not None and mapping.layout == layout else None
+
+
+def delete_mapping(mapping, mapping_dir=None):
+    path = _mapping_path(mapping.layout, mapping_dir or MAPPING_DIR)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,37 @@
+"""Đo bộ nhớ tiến trình với chi phí thấp (không dùng tracemalloc)."""
+import os
+import sys
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """
+    Bộ nhớ thường trú (RSS) hiện tại của tiến trình, tính bằng byte.
+    Trên hệ không có /proc dùng ru_maxrss (đỉnh RSS) làm xấp xỉ; None nếu không đo được.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class PeakTracker:
+    """Lấy mẫu RSS tại các điểm gọi sample() và ghi nhận mức tăng lớn nhất so với lúc bắt đầu."""
+
+    def __init__(self):
+        self.start_bytes = rss_bytes()
+        self.peak_bytes = 0
+
+    def sample(self):
+        current = rss_bytes()
+        if current is not None and self.start_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes, current - self.start_bytes)
+        return current
@@ -0,0 +1,156 @@
+"""
+Đồ thị phụ thuộc giữa các bảng dẫn xuất của báo cáo; mỗi bảng được ghi nhớ theo đúng đầu vào của nó.
+
+    normalized, as_of ── aged ─┬─ kpis
+                               ├─ pivot ─────┬─ report ─ grid_positions ─┬─ grid_total ─┬─ grid_options
+                               ├─ tooltips ──┘                           └─ grid_frame ─┘
+                               └─ chart_frames ─┬─ stacked_bar
+                                                └─ top_customers
+    normalized, trend_dates ── aging_trend
+    normalized ── customer_index
+
+Đầu vào gốc (normalized, as_of, top_n, grid_query, grid_page, trend_dates) mang một khóa:
+mã băm dữ liệu, ngày chốt hoặc chính giá trị tùy chọn. Khóa của một artifact được dựng từ
+khóa các đầu vào của nó, nên đổi ngày chốt chỉ làm 'aged' và các bảng phía sau được tính
+lại, còn đổi trang grid chỉ dựng lại grid_frame/grid_options. Artifact được tính lười: đã
+có trong cache thì các đầu vào của nó cũng không phải tính (vd. không cần frame 'aged' khi
+mọi bảng phía sau đều đã có).
+
+REPORT_GRAPH chỉ gồm các bảng của báo cáo (aged, kpis, pivot, tooltips, report, chart_frames,
+top_customers) và được engine/CLI dùng; DASHBOARD_GRAPH thêm các bảng chỉ giao diện cần.
+Hai đồ thị dựng khóa như nhau nên dùng chung các mục trong cache.
+"""
+from collections import namedtuple
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from . import aging, chart_data, drilldown, grid_data, report
+from .cache import frame_nbytes, shared_cache
+from .profiling import NULL_PROFILER
+
+Input = namedtuple('Input', 'key value') # Đầu vào gốc có giá trị không dùng trực tiếp làm khóa được (vd. DataFrame)
+
+
+@dataclass(frozen=True)
+class Artifact:
+    name: str
+    inputs: tuple # Tên các artifact/đầu vào gốc, theo thứ tự tham số của build
+    build: object
+
+
+def artifact_nbytes(value):
+    """Ước lượng dung lượng để cache LRU giới hạn theo byte."""
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, tuple):
+        return sum(artifact_nbytes(item) for item in value)
+    nbytes = getattr(value, 'nbytes', None)
+    return int(nbytes) if nbytes is not None else 1024
+
+
+def artifact_rows(value):
+    return len(value) if isinstance(value, (pd.DataFrame, np.ndarray)) else None
+
+
+class ArtifactGraph:
+    def __init__(self, artifacts):
+        self.artifacts = {artifact.name: artifact for artifact in artifacts}
+
+    def run(self, cache=shared_cache, profiler=NULL_PROFILER, **inputs):
+        return GraphRun(self, cache, profiler, inputs)
+
+
+class GraphRun:
+    """
+    Các artifact của một lần chạy script. Đầu vào gốc có thể bind dần (vd. khi widget được
+    vẽ), nhưng phải trước lần get đầu tiên của artifact phụ thuộc vào nó.
+    """
+
+    def __init__(self, graph, cache, profiler, inputs):
+        self.graph = graph
+        self.cache = cache
+        self.profiler = profiler
+        self._inputs = {}
+        self._keys = {}
+        self._values = {}
+        self.bind(**inputs)
+
+    def bind(self, **inputs):
+        for name, value in inputs.items():
+            self._inputs[name] = value if isinstance(value, Input) else Input(value, value)
+        return self
+
+    def key(self, name):
+        if name in self._inputs:
+            return self._inputs[name].key
+        if name not in self._keys:
+            artifact = self.graph.artifacts[name]
+            self._keys[name] = (name,) + tuple(self.key(dep) for dep in artifact.inputs)
+        return self._keys[name]
+
+    def get(self, name):
+        if name in self._inputs:
+            return self._inputs[name].value
+        if name in self._values:
+            return self._values[name]
+
+        artifact = self.graph.artifacts[name]
+        cache_key = ("artifact",) + self.key(name)
+        value = self.cache.get(cache_key)
+        if value is None:
+            args = [self.get(dep) for dep in artifact.inputs] # Tính đầu vào trước để thời gian đo không lồng nhau
+            with self.profiler.stage(name) as timing:
+                value = artifact.build(*args)
+                timing.rows = artifact_rows(value)
+            self.cache.put(cache_key, value, artifact_nbytes(value))
+        else:
+            self.profiler.record(name, rows=artifact_rows(value), note='cache')
+        self._values[name] = value
+        return value
+
+    __getitem__ = get
+
+
+def _grid_positions(report_df, grid_query):
+    """grid_query = (search, sort_by, ascending); None = giữ nguyên thứ tự của báo cáo."""
+    if grid_query is None:
+        return np.arange(len(report_df))
+    return grid_data.query_positions(report_df, *grid_query)
+
+
+def _grid_frame(report_df, positions, grid_page):
+    """grid_page = (page, page_size) ở chế độ phân trang phía server; None = cả bảng."""
+    if grid_page is None:
+        return report_df
+    return grid_data.page_slice(report_df, positions, *grid_page)
+
+
+def _grid_options(grid_frame, total_row_data, grid_page):
+    from .grid_options import build_grid_options # st_aggrid chỉ cần khi chạy dashboard
+
+    return build_grid_options(grid_frame, total_row_data, server_side=grid_page is not None)
+
+
+REPORT_ARTIFACTS = (
+    Artifact('aged', ('normalized', 'as_of'), aging.age_frame),
+    Artifact('kpis', ('aged',), report.compute_kpis),
+    Artifact('pivot', ('aged',), report.build_aging_pivot),
+    Artifact('tooltips', ('aged',), report.build_tooltips),
+    Artifact('report', ('pivot', 'tooltips'), report.combine_report),
+    Artifact('chart_frames', ('aged',), chart_data.aggregate_chart_data),
+    Artifact('top_customers', ('chart_frames',), chart_data.top_customers_data),
+)
+
+REPORT_GRAPH = ArtifactGraph(REPORT_ARTIFACTS)
+
+DASHBOARD_GRAPH = ArtifactGraph(REPORT_ARTIFACTS + (
+    Artifact('stacked_bar', ('chart_frames', 'top_n'), chart_data.stacked_bar_data),
+    Artifact('aging_trend', ('normalized', 'trend_dates'), chart_data.aging_trend_data),
+    Artifact('customer_index', ('normalized',), drilldown.build_customer_index),
+    Artifact('grid_positions', ('report', 'grid_query'), _grid_positions),
+    Artifact('grid_total', ('report', 'grid_positions'), grid_data.total_row),
+    Artifact('grid_frame', ('report', 'grid_positions', 'grid_page'), _grid_frame),
+    Artifact('grid_options', ('grid_frame', 'grid_total', 'grid_page'), _grid_options),
+))
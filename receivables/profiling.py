@@ -0,0 +1,106 @@
+"""
+Đo thời gian, số dòng và mức thay đổi bộ nhớ của từng bước xử lý (chế độ chẩn đoán).
+
+Bật bằng toggle ở sidebar hoặc biến môi trường AR_PROFILE=1. Khi đặt AR_PROFILE_LOG,
+mỗi lần chạy được ghi thêm một dòng JSON vào file đó để đính kèm vào báo lỗi.
+Khi tắt, StageProfiler không đo gì nên chi phí gần như bằng không.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from .memory import rss_bytes
+
+PROFILE_ENV = "AR_PROFILE"
+PROFILE_LOG_ENV = "AR_PROFILE_LOG"
+
+
+def enabled_from_env():
+    return os.environ.get(PROFILE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def log_path_from_env():
+    return os.environ.get(PROFILE_LOG_ENV) or None
+
+
+@dataclass
+class StageTiming:
+    name: str
+    seconds: float = 0.0
+    rows: int = None          # Số dòng đầu ra của bước (nếu có)
+    memory_delta: int = None  # Chênh lệch RSS (byte) trước/sau bước
+    note: str = ''            # vd. 'cache' khi kết quả lấy từ cache
+
+
+class StageProfiler:
+    """Ghi nhận các bước theo thứ tự thực hiện; dùng `with profiler.stage(...) as timing:`."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        self.started_at = datetime.now()
+
+    @contextmanager
+    def stage(self, name, rows=None, note=''):
+        timing = StageTiming(name, rows=rows, note=note)
+        if not self.enabled:
+            yield timing
+            return
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.seconds = time.perf_counter() - start
+            rss_after = rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                timing.memory_delta = rss_after - rss_before
+            self.stages.append(timing)
+
+    def record(self, name, rows=None, note=''):
+        """Ghi một bước không tốn thời gian đáng kể, vd. kết quả lấy thẳng từ cache."""
+        if self.enabled:
+            self.stages.append(StageTiming(name, rows=rows, note=note))
+
+    @property
+    def total_seconds(self):
+        return sum(timing.seconds for timing in self.stages)
+
+    def to_frame(self):
+        """Bảng hiển thị cho panel chẩn đoán."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            'Bước': [timing.name for timing in self.stages],
+            'Thời gian (s)': [round(timing.seconds, 4) for timing in self.stages],
+            'Số dòng': pd.array([timing.rows for timing in self.stages], dtype='Int64'),
+            'Bộ nhớ (MB)': [
+                None if timing.memory_delta is None else round(timing.memory_delta / 1024 ** 2, 1)
+                for timing in self.stages
+            ],
+            'Ghi chú': [timing.note for timing in self.stages],
+        })
+
+    def to_dict(self, **context):
+        """Bản ghi JSON được (context: tên file, sheet, ... để biết lần chạy thuộc dữ liệu nào)."""
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': self.total_seconds,
+            'context': context,
+            'stages': [asdict(timing) for timing in self.stages],
+        }
+
+    def to_json(self, indent=None, **context):
+        return json.dumps(self.to_dict(**context), ensure_ascii=False, indent=indent, default=str)
+
+    def write_log(self, path, **context):
+        """Ghi thêm một dòng JSON vào file log."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as log_file:
+            log_file.write(self.to_json(**context) + "\n")
+
+
+NULL_PROFILER = StageProfiler(enabled=False) # Mặc định cho các hàm nhận tham số profiler
@@ -0,0 +1,137 @@
+"""
+Bảng báo cáo tuổi nợ theo khách hàng và nội dung tooltip chi tiết theo loại hình dịch vụ.
+
+Tooltip cho mọi ô (khách hàng, nhóm tuổi nợ) và cho cột tổng được dựng trong một lần
+groupby + nối chuỗi; pivot và tooltip được cache như các artifact của pipeline.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .aging import AGE_LABELS
+
+CUSTOMER_COLUMN = 'Khách hàng'
+TOTAL_COLUMN = 'Dư nợ'
+AMOUNT_COLUMNS = AGE_LABELS + [TOTAL_COLUMN]
+TOOLTIP_SUFFIX = '_tooltip'
+
+
+def format_vnd(amount):
+    """Định dạng số tiền sang kiểu VND"""
+    if pd.isna(amount) or amount == 0:
+        return "0"
+    return f"{int(amount):,.0f}" # Không có phần thập phân
+
+
+def format_vnd_values(amounts):
+    """
+    format_vnd cho cả mảng số tiền (NaN xem như 0), trả về pyarrow StringArray. Số được
+    đệm trái tới độ dài cố định, cắt thành các nhóm 3 chữ số rồi nối bằng dấu phẩy và bỏ
+    phần đệm, đều bằng hàm compute của Arrow, không gọi Python cho từng giá trị.
+    """
+    values = np.trunc(np.nan_to_num(np.asarray(amounts, dtype='float64'))).astype('int64')
+    magnitudes = np.abs(values)
+    width = -(-len(str(magnitudes.max(initial=0))) // 3) * 3 # Số chữ số lớn nhất, làm tròn lên bội của 3
+    digits = pc.utf8_lpad(pa.array(magnitudes).cast(pa.string()), width=width)
+    groups = [pc.utf8_slice_codeunits(digits, start, start + 3) for start in range(0, width, 3)]
+    text = groups[0] if len(groups) == 1 else pc.binary_join_element_wise(*groups, ',')
+    text = pc.utf8_ltrim(text, characters=' ,')
+    return pc.if_else(pa.array(values < 0), pc.binary_join_element_wise('-', text, ''), text)
+
+
+def tooltip_column(col_name):
+    return f'{col_name}{TOOLTIP_SUFFIX}'
+
+
+def build_aging_pivot(aged_df):
+    """Pivot dư nợ theo khách hàng × nhóm tuổi nợ, kèm cột tổng, sắp xếp giảm dần theo dư nợ."""
+    aging_pivot = pd.pivot_table(
+        aged_df,
+        index='customer',
+        columns='age_category',
+        values='amount',
+        aggfunc='sum',
+        fill_value=0,
+        observed=False
+    )
+    aging_pivot = aging_pivot.reindex(columns=AGE_LABELS, fill_value=0)
+    aging_pivot.columns = list(AGE_LABELS)
+    aging_pivot[TOTAL_COLUMN] = aging_pivot.sum(axis=1)
+    aging_pivot.index.name = CUSTOMER_COLUMN
+    return aging_pivot.sort_values(by=TOTAL_COLUMN, ascending=False)
+
+
+def _join_service_lines(breakdown, keys):
+    """
+    Từ tổng tiền theo keys + service_type (breakdown đã sắp theo index), nối thành một chuỗi
+    "R: 1,000\\nE: 2,000" cho mỗi nhóm keys. Chỉ giữ các dịch vụ có số tiền dương, giống như tooltip cũ.
+    """
+    breakdown = breakdown[breakdown > 0]
+    if breakdown.empty:
+        return pd.Series(dtype=object)
+    service_level = breakdown.index.names.index('service_type')
+    service_names = pa.array(breakdown.index.levels[service_level].astype(str).tolist(), type=pa.string())
+    services = service_names.take(pa.array(breakdown.index.codes[service_level]))
+    lines = pc.binary_join_element_wise(services, format_vnd_values(breakdown.to_numpy()), ': ')
+
+    # Mỗi nhóm keys là một đoạn liên tiếp; ranh giới là nơi mã của một key đổi
+    is_start = np.zeros(len(breakdown), dtype=bool)
+    is_start[0] = True
+    for level in range(len(keys)):
+        codes = breakdown.index.codes[level]
+        is_start[1:] |= codes[1:] != codes[:-1]
+    starts = np.flatnonzero(is_start)
+    sizes = np.diff(np.r_[starts, len(breakdown)])
+
+    # Nối dòng thứ k của mọi nhóm cùng lúc; nhóm ít dòng hơn nhận null và bị bỏ qua khi nối.
+    # Số lượt bằng số dịch vụ nhiều nhất của một nhóm, không phụ thuộc số khách hàng.
+    text = lines.take(pa.array(starts))
+    for k in range(1, int(sizes.max())):
+        line_k = lines.take(pa.array(starts + k, mask=sizes <= k))
+        text = pc.binary_join_element_wise(text, line_k, '\n', null_handling='skip')
+    return pd.Series(
+        text.to_numpy(zero_copy_only=False), index=breakdown.index.droplevel('service_type')[starts], dtype=object
+    )
+
+
+def build_tooltips(aged_df):
+    """
+    Tooltip theo khách hàng cho từng nhóm tuổi nợ và cho cột tổng dư nợ. Chỉ một lần groupby
+    trên các dòng hóa đơn; tooltip cột tổng cộng dồn từ kết quả đã gộp (nhỏ hơn nhiều).
+    """
+    by_service = aged_df.groupby(['customer', 'age_category', 'service_type'], observed=True)['amount'].sum()
+    by_age = _join_service_lines(by_service, ['customer', 'age_category'])
+    if by_age.empty:
+        tooltips = pd.DataFrame(columns=AGE_LABELS, dtype=object)
+    else:
+        tooltips = by_age.unstack('age_category')
+    tooltips = tooltips.reindex(columns=AGE_LABELS)
+    tooltips.columns = list(AGE_LABELS)
+    by_customer = by_service.groupby(level=['customer', 'service_type'], observed=True).sum()
+    tooltips[TOTAL_COLUMN] = _join_service_lines(by_customer, ['customer'])
+    tooltips.columns = [tooltip_column(col) for col in tooltips.columns]
+    return tooltips
+
+
+def combine_report(aging_pivot, tooltips):
+    """Ghép pivot với các cột *_tooltip (None khi ô không có chi tiết) thành bảng báo cáo."""
+    tooltips = tooltips.reindex(aging_pivot.index)
+    tooltips = tooltips.astype(object).where(tooltips.notna(), None)
+    return aging_pivot.join(tooltips).reset_index()
+
+
+def build_aging_report(aged_df):
+    """Bảng báo cáo tuổi nợ (cột 'Khách hàng', các nhóm tuổi nợ, 'Dư nợ') kèm các cột *_tooltip."""
+    return combine_report(build_aging_pivot(aged_df), build_tooltips(aged_df))
+
+
+def compute_kpis(aged_df):
+    """Các chỉ tiêu chính: tổng dư nợ, dư nợ quá hạn và dư nợ quá hạn trên 30 ngày."""
+    amount = aged_df['amount'].to_numpy(dtype='float64')
+    days_overdue = aged_df['days_overdue'].to_numpy(dtype='float64')
+    return {
+        'total_receivable': float(amount.sum()),
+        'total_overdue': float(amount[days_overdue > 0].sum()),
+        'overdue_30_plus': float(amount[days_overdue > 30].sum()),
+    }
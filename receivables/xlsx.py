@@ -0,0 +1,172 @@
+"""
+Ghi file .xlsx theo luồng, không qua openpyxl.
+
+XML của mỗi sheet được sinh theo từng khối dòng bằng phép nối chuỗi vector của pandas và
+ghi thẳng vào gói zip, nên bộ nhớ chỉ phụ thuộc kích thước khối, và nhanh hơn nhiều so với
+chế độ write-only của openpyxl (tạo một đối tượng cell cho mỗi ô). Chỉ hỗ trợ những gì bảng
+xuất cần: chuỗi, số, ngày, dòng tiêu đề và dòng tổng in đậm, cố định dòng tiêu đề.
+"""
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+_ILLEGAL_XML_CHARS = r'[\x00-\x08\x0b\x0c\x0e-\x1f]'
+
+# Chỉ số style (cellXfs) trong _STYLES
+STYLE_TEXT, STYLE_BOLD, STYLE_NUMBER, STYLE_DATE, STYLE_BOLD_NUMBER = 0, 1, 2, 3, 4
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheets}'
+    '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{index}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="3" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="3" fontId="1" fillId="0" borderId="0" xfId="0" applyNumberFormat="1" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews>'
+    '<cols><col min="1" max="1" width="32" customWidth="1"/><col min="2" max="{n_cols}" width="18" customWidth="1"/></cols>'
+    '<sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _text(series):
+    text = series.astype(str).str.replace(_ILLEGAL_XML_CHARS, '', regex=True)
+    return text.str.replace('&', '&amp;', regex=False).str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False)
+
+
+def column_cells(series, bold=False):
+    """Chuỗi XML <c> cho từng giá trị của series (ô trống khi thiếu giá trị)."""
+    present = series.notna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        serial = (series.dt.tz_localize(None) if series.dt.tz is not None else series) - EXCEL_EPOCH
+        cells = f'<c s="{STYLE_DATE}"><v>' + (serial / pd.Timedelta(days=1)).astype(str) + '</v></c>'
+    elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        style = STYLE_BOLD_NUMBER if bold else STYLE_NUMBER
+        cells = f'<c s="{style}"><v>' + series.astype(str) + '</v></c>'
+        # Excel không có giá trị số cho inf/-inf ("<v>inf</v>" làm hỏng file): ghi ô trống như NaN
+        present = present & np.isfinite(series.to_numpy(dtype='float64', na_value=np.nan))
+    else:
+        style = STYLE_BOLD if bold else STYLE_TEXT
+        cells = f'<c t="inlineStr" s="{style}"><is><t xml:space="preserve">' + _text(series) + '</t></is></c>'
+    return cells.astype(object).where(present, '<c/>')
+
+
+def rows_xml(df, bold=False):
+    """XML của các dòng dữ liệu trong df (không có dòng tiêu đề)."""
+    if df.empty:
+        return ''
+    rows = '<row>' + column_cells(df.iloc[:, 0], bold)
+    for i in range(1, df.shape[1]):
+        rows = rows + column_cells(df.iloc[:, i], bold)
+    return ''.join((rows + '</row>').tolist())
+
+
+def header_xml(columns):
+    cells = ''.join(
+        f'<c t="inlineStr" s="{STYLE_BOLD}"><is><t xml:space="preserve">{escape(str(col))}</t></is></c>' for col in columns
+    )
+    return f'<row>{cells}</row>'
+
+
+class XlsxWriter:
+    """
+    Workbook ghi theo luồng: mỗi lần write_sheet ghi trọn một sheet vào gói zip.
+
+        with XlsxWriter(target) as writer:
+            writer.write_sheet('Tuổi nợ', df, bold_last_row=True)
+    """
+
+    def __init__(self, target, chunk_rows=CHUNK_ROWS):
+        # Mức nén thấp: nhanh hơn nhiều, file vẫn nhỏ vì XML lặp lại nhiều
+        self._archive = zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+        self._titles = []
+        self.chunk_rows = chunk_rows
+
+    def write_sheet(self, title, df, bold_last_row=False):
+        index = len(self._titles) + 1
+        body_rows = len(df) - 1 if bold_last_row and len(df) else len(df)
+        with self._archive.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.format(n_cols=max(2, df.shape[1])).encode('utf-8'))
+            sheet.write(header_xml(df.columns).encode('utf-8'))
+            for start in range(0, body_rows, self.chunk_rows):
+                sheet.write(rows_xml(df.iloc[start:min(start + self.chunk_rows, body_rows)]).encode('utf-8'))
+            if body_rows < len(df):
+                sheet.write(rows_xml(df.iloc[body_rows:], bold=True).encode('utf-8'))
+            sheet.write(_SHEET_END.encode('utf-8'))
+        self._titles.append(title[:31]) # Excel giới hạn tên sheet 31 ký tự
+
+    def close(self):
+        indexes = range(1, len(self._titles) + 1)
+        self._archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(index=i) for i in indexes)
+        ))
+        self._archive.writestr('_rels/.rels', _ROOT_RELS)
+        self._archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, title in zip(indexes, self._titles)
+        )))
+        self._archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_SHEET_REL.format(index=i) for i in indexes)
+        ))
+        self._archive.writestr('xl/styles.xml', _STYLES)
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from receivables import aging
+
+AS_OF = pd.Timestamp('2026-06-30')
+
+
+def test_bucket_edges():
+    days = pd.Series([-5, 0, 1, 30, 31, 60, 61, 90, 91, 400, np.nan])
+    categories = aging.categorize_days(days)
+    assert categories.astype(object).where(categories.notna(), None).tolist() == [
+        'Trong hạn', 'Trong hạn', '1-30', '1-30', '31-60', '31-60', '61-90', '61-90', 'Trên 90', 'Trên 90', None,
+    ]
+
+
+def test_missing_due_date_has_no_bucket():
+    df = pd.DataFrame({'due_date': pd.to_datetime(['2026-06-29', None]), 'amount': [100.0, 200.0]})
+    aged = aging.age_frame(df, AS_OF)
+    assert aged['days_overdue'].tolist()[0] == 1
+    assert aged['age_category'].isna().tolist() == [False, True]
+
+
+def test_aging_trend_matches_age_frame_at_each_date():
+    rng = np.random.default_rng(0)
+    due_dates = pd.Series(AS_OF - pd.to_timedelta(rng.integers(-60, 400, size=500), unit='D'))
+    due_dates[::37] = pd.NaT
+    df = pd.DataFrame({'due_date': due_dates, 'amount': rng.integers(1, 10_000, size=500).astype('float64')})
+    as_of_dates = aging.period_end_dates(AS_OF, periods=12, freq='ME')
+
+    trend = aging.aging_trend(df, as_of_dates)
+
+    expected = pd.DataFrame(
+        [aging.age_frame(df, as_of).groupby('age_category', observed=False)['amount'].sum() for as_of in as_of_dates],
+        index=pd.DatetimeIndex(as_of_dates, name='as_of'),
+    )
+    expected.columns = list(aging.AGE_LABELS)
+    pd.testing.assert_frame_equal(trend, expected, check_freq=False)
@@ -0,0 +1,64 @@
+import io
+
+import pandas as pd
+import pytest
+
+from receivables import ingest, mappings
+
+SHEET = 'CongNo'
+
+
+def _workbook(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, sheet_name=SHEET)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def ledger_bytes():
+    # Cột đầu (STT) không dùng tới, nên vị trí các cột cần đọc không bắt đầu từ 0
+    return _workbook(pd.DataFrame({
+        'STT': [1, 2, 3],
+        'Khách hàng ': ['KH A', 'KH B', 'KH A'],
+        'Hạn TT': pd.to_datetime(['2026-01-15', '2026-02-01', '2026-03-10']),
+        'DƯ NỢ ': [1000.0, 2500.0, 300.0],
+        'Loại hình': ['R', 'E', 'W'],
+    }))
+
+
+def _saved_mapping(data, tmp_path):
+    detected = ingest.parse_sheet(data, SHEET)
+    return detected, mappings.save_mapping(
+        ingest.read_header(data, SHEET), detected.columns, mappings.read_dtypes(detected.source_dtypes),
+        name='mau', mapping_dir=str(tmp_path),
+    )
+
+
+def test_mapped_read_with_leading_extra_column(ledger_bytes, tmp_path):
+    detected, saved = _saved_mapping(ledger_bytes, tmp_path)
+    mapping = mappings.find_mapping(ledger_bytes, SHEET, mapping_dir=str(tmp_path))
+    assert mapping == saved
+
+    sheet = ingest.parse_sheet(ledger_bytes, SHEET, mapping=mapping)
+    assert sheet.mapping_name == 'mau'
+    assert pd.api.types.is_datetime64_any_dtype(sheet.frame['due_date'])
+    pd.testing.assert_frame_equal(sheet.frame, detected.frame)
+
+
+def test_broken_mapping_falls_back_to_detection(ledger_bytes, tmp_path):
+    detected, saved = _saved_mapping(ledger_bytes, tmp_path)
+    saved.dtypes = {'due_date': 'float64'} # Ngày không đọc được dạng số
+
+    sheet = ingest.parse_sheet(ledger_bytes, SHEET, mapping=saved)
+    assert sheet.mapping_name is None
+    pd.testing.assert_frame_equal(sheet.frame, detected.frame)
+
+
+def test_unreadable_header_means_no_mapping(ledger_bytes, tmp_path, monkeypatch):
+    _saved_mapping(ledger_bytes, tmp_path)
+
+    def broken_header(*args, **kwargs):
+        raise StopIteration # vd. workbook thiếu quan hệ tới sheet mà pandas vẫn đọc được
+    monkeypatch.setattr(mappings, 'read_header', broken_header)
+
+    assert mappings.find_mapping(ledger_bytes, SHEET, mapping_dir=str(tmp_path)) is None
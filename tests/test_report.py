@@ -0,0 +1,44 @@
+import pandas as pd
+
+from receivables import aging, report
+
+AS_OF = pd.Timestamp('2026-06-30')
+
+
+def _old_tooltip(rows):
+    """Tooltip như cách dashboard cũ dựng cho từng ô: tổng theo dịch vụ, chỉ giữ số tiền dương."""
+    lines = [
+        f"{service}: {report.format_vnd(amount)}"
+        for service, amount in rows.groupby('service_type')['amount'].sum().items()
+        if pd.notna(amount) and amount > 0
+    ]
+    return "\n".join(lines) if lines else None
+
+
+def test_tooltips_match_per_cell_formatting():
+    df = pd.DataFrame({
+        'customer': ['KH A', 'KH A', 'KH A', 'KH A', 'KH B', 'KH B', 'KH B', 'KH C', 'KH D', 'KH D', 'KH D'],
+        'due_date': pd.to_datetime([
+            '2026-07-15', '2026-07-20', '2026-06-10', '2026-01-01', '2026-06-01', '2026-06-01', '2026-04-01', '2026-06-29',
+            '2026-07-01', '2026-06-20', '2026-05-10',
+        ]),
+        # KH D: phần lẻ của cùng một dịch vụ nằm ở nhiều nhóm tuổi nợ, cộng lại vừa tròn 1
+        'amount': [1000.7, 0.6, 2500.5, 123_456_789_012_345.9, 999.99, -500.0, 4_000_000_000.0, -10.0, 0.7, 0.1, 0.2],
+        'service_type': ['R', 'R', 'E', 'W', 'E', 'R', 'E', 'R', 'R', 'R', 'R'],
+    })
+    df['customer'] = df['customer'].astype('category')
+    df['service_type'] = df['service_type'].astype('category')
+    aged = aging.age_frame(df, AS_OF)
+
+    tooltips = report.build_tooltips(aged)
+    tooltips = tooltips.astype(object).where(tooltips.notna(), None)
+
+    for customer, rows in aged.groupby('customer', observed=True):
+        expected = {report.tooltip_column(label): _old_tooltip(rows[rows['age_category'] == label]) for label in aging.AGE_LABELS}
+        expected[report.tooltip_column(report.TOTAL_COLUMN)] = _old_tooltip(rows)
+        actual = tooltips.loc[customer].to_dict() if customer in tooltips.index else dict.fromkeys(expected)
+        assert actual == expected, customer
+
+def test_format_vnd_values_matches_format_vnd():
+    amounts = [0.0, float('nan'), 0.4, 1.0, 999.99, 1000.0, 1000.7, -1234.5, 123_456_789_012_345.9]
+    assert report.format_vnd_values(pd.Series(amounts).to_numpy()).to_pylist() == [report.format_vnd(a) for a in amounts]
@@ -0,0 +1,38 @@
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from receivables.xlsx import XlsxWriter
+
+
+def _round_trip(df, **kwargs):
+    buffer = io.BytesIO()
+    with XlsxWriter(buffer) as writer:
+        writer.write_sheet('Tuổi nợ', df, **kwargs)
+    buffer.seek(0)
+    sheet = openpyxl.load_workbook(buffer).worksheets[0]
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_non_finite_numbers_are_written_as_empty_cells():
+    df = pd.DataFrame({
+        'Khách hàng': ['KH <A> & co', 'KH B', 'KH C', 'Tổng cộng'],
+        'Dư nợ': [1500.5, np.inf, -np.inf, np.nan],
+        'Số HĐ': pd.array([1, None, 3, 4], dtype='Int64'),
+    })
+    rows = _round_trip(df, bold_last_row=True)
+    assert rows == [
+        ['Khách hàng', 'Dư nợ', 'Số HĐ'],
+        ['KH <A> & co', 1500.5, 1],
+        ['KH B', None, None],
+        ['KH C', None, 3],
+        ['Tổng cộng', None, 4],
+    ]
+
+
+def test_dates_round_trip():
+    df = pd.DataFrame({'Hạn TT': pd.to_datetime(['2026-01-15', None, '2026-03-10'])})
+    rows = _round_trip(df)
+    assert rows[1:] == [[pd.Timestamp('2026-01-15').to_pydatetime()], [None], [pd.Timestamp('2026-03-10').to_pydatetime()]]